@@ -1,25 +1,54 @@
-from engine import Engine
-from flask import Flask, request, send_file, jsonify, render_template
-from pathlib import Path
+from engine import BatchRunner, Engine
+from engine.batch import BATCH_MODES
+from engine.crawler import close_browser_pool
+from engine.functions.parallel import close_process_pool
+from engine.jobs import JOB_STAGES, JobManager, QueueFull
+from engine.lighthouse import close_worker_pool
+from flask import Flask, Response, request, send_file, jsonify, render_template, url_for
+from io import BytesIO
+from server import (
+    artifacts,
+    audit_config,
+    batch_limits,
+    cache,
+    engine_from_values,
+    register,
+    site_crawler_from_values,
+)
 import os
 import requests
 import asyncio
+import atexit
+import json
 
 
+# Engine runs happen on the job manager's event loop, in a background thread, so that
+# handlers don't hold up each other. AWE_WORKERS of them run at the same time.
+jobs = JobManager(
+    workers=int(os.environ.get("AWE_WORKERS") or 4),
+    max_pending=int(os.environ.get("AWE_MAX_PENDING_JOBS") or 100),
+    retention=int(os.environ.get("AWE_JOB_RETENTION") or 3600),
+    max_finished=int(os.environ.get("AWE_MAX_FINISHED_JOBS") or 1000),
+)
+
 # On *nix systems, the event loop needs to have a child watcher attached but this isn't
 # done automatically, additionally it can only be done while in the main thread which
-# is where Flask runs.
-try:
-    loop = asyncio.get_event_loop()
-except RuntimeError:
-    loop = asyncio.new_event_loop()
-finally:
-    asyncio.get_child_watcher().attach_loop(loop)
+# is where Flask runs, even if the loop itself runs in another thread.
+asyncio.get_child_watcher().attach_loop(jobs.loop)
+jobs.start()
 
-app = Flask(__name__, static_folder="dist/static", template_folder="dist")
 
-ROOT_DIR = Path(os.environ.get("ROOT_DIR") or Path.cwd())
-OUTPUT_DIR = Path(ROOT_DIR, "results/")
+@atexit.register
+def shutdown():
+    """Close the browsers and processes shared by the engines before exiting."""
+    jobs.run(close_browser_pool(), limited=False)
+    jobs.run(close_worker_pool(), limited=False)
+    jobs.shutdown()
+    close_process_pool()
+
+
+app = Flask(__name__, static_folder="dist/static", template_folder="dist")
+register(app)
 
 
 @app.route("/api/analyze")
@@ -31,11 +60,19 @@ def get_analysis():
     if output_format not in ("html", "json"):
         output_format = "json"
 
+    # The html report is meant to be read by people and defaults to every category
+    config = audit_config(request.values, "full" if output_format == "html" else None)
+
     print(f"Calling lighthouse on {target_url}")
-    engine = Engine(target_url=target_url)
+    engine = Engine(
+        target_url=target_url,
+        audit_format=output_format,
+        audit_config=config,
+        cache=cache,
+        artifacts=artifacts,
+    )
 
-    asyncio.set_event_loop(loop)
-    loop.run_until_complete(engine.run_analysis())
+    jobs.run(engine.run_analysis())
 
     print("Sending analysis")
     if output_format == "json":
@@ -45,7 +82,7 @@ def get_analysis():
             send_file(
                 engine.audit,
                 as_attachment=True,
-                attachment_filename=f"awe_analysis.{output_format}",
+                download_name=f"awe_analysis.{output_format}",
             ),
             200,
         )
@@ -58,14 +95,13 @@ def crawl():
     print("Calling crawler")
     engine = Engine(target_url=target_url)
 
-    asyncio.set_event_loop(loop)
-    loop.run_until_complete(engine.run_crawler())
+    jobs.run(engine.run_crawler())
 
     return (
         send_file(
             engine.site_html,
             as_attachment=True,
-            attachment_filename="awe_site_crawl.html",
+            download_name="awe_site_crawl.html",
         ),
         200,
     )
@@ -73,23 +109,130 @@ def crawl():
 
 @app.route("/api/run_engine")
 def awe():
-    target_url = request.args.get("url", default="", type=str)
+    engine = engine_from_values(request.values)
+    jobs.run(engine.run_engine())
 
-    engine = Engine(target_url=target_url)
+    return (
+        send_file(
+            engine.accessible_site,
+            as_attachment=True,
+            download_name="awe_site.html",
+        ),
+        200,
+    )
 
-    asyncio.set_event_loop(loop)
-    loop.run_until_complete(engine.run_engine())
 
+@app.route("/api/jobs", methods=["POST"])
+def submit_job():
+    """
+    Queue an Engine run in the background. The kind of run is given by the "kind"
+    parameter, one of analyze, crawl, run_engine or site, the other parameters are the
+    same as for /api/run_engine, or /api/site.
+    """
+    kind = request.values.get("kind", default="run_engine", type=str)
+    if kind not in JOB_STAGES:
+        return jsonify({"error": f"Unknown job kind {kind}"}), 400
+
+    if kind == "site":
+        return _submit(kind, site_crawler_from_values(request.values))
+    return _submit(kind, engine_from_values(request.values))
+
+
+@app.route("/api/jobs/<job_id>")
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job.to_dict()), 200
+
+
+@app.route("/api/jobs/<job_id>/result")
+def job_result(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    if not job.finished:
+        return jsonify(job.to_dict()), 409
+    if job.error:
+        return jsonify(job.to_dict()), 500
+
+    if job.kind in ("analyze", "site"):
+        return jsonify(job.result), 200
     return (
         send_file(
-            engine.accessible_site,
+            BytesIO(job.result),
             as_attachment=True,
-            attachment_filename="awe_site.html",
+            download_name=f"awe_{job.kind}.html",
         ),
         200,
     )
 
 
+@app.route("/api/batch", methods=["POST"])
+def batch():
+    """
+    Run the Engine on a list of URLs. The JSON body holds the "urls", the "mode"
+    (analyze or run_engine) and optionally the "concurrency" and "per_host" limits.
+    Results are streamed back as JSON lines as soon as each URL is done.
+    """
+    body = request.get_json(force=True, silent=True) or {}
+    urls = body.get("urls")
+    mode = body.get("mode", "analyze")
+    if not isinstance(urls, list) or mode not in BATCH_MODES:
+        return jsonify({"error": "Expected a list of urls and a valid mode"}), 400
+
+    runner = BatchRunner(
+        mode=mode,
+        **batch_limits(body),
+        engine_options={"cache": cache, "artifacts": artifacts},
+    )
+
+    def stream_results():
+        results = runner.run(urls)
+        try:
+            while True:
+                result = jobs.run(_next_result(results), limited=False)
+                if result is None:
+                    return
+                yield json.dumps(result) + "\n"
+        finally:
+            # Cancels the URLs left if the client went away
+            jobs.run(results.aclose(), limited=False)
+
+    return Response(stream_results(), mimetype="application/x-ndjson")
+
+
+async def _next_result(results):
+    """Get the next result of the async generator, None once it is exhausted."""
+    try:
+        return await results.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+@app.route("/api/site")
+def site():
+    """
+    Queue a run of the Engine on every page of the site found from its sitemap and
+    links, at most "max_pages" of them. The accessible pages and the report are written
+    to the results folder, the report is the result of the job.
+    """
+    return _submit("site", site_crawler_from_values(request.values))
+
+
+def _submit(kind, runner):
+    """Queue the job and send back its status along with where to follow it."""
+    try:
+        job = jobs.submit(kind, runner)
+    except QueueFull as e:
+        return jsonify({"error": str(e)}), 503
+
+    status = job.to_dict()
+    status["status_url"] = url_for("job_status", job_id=job.id)
+    status["result_url"] = url_for("job_result", job_id=job.id)
+    return jsonify(status), 202
+
+
 @app.route("/", defaults={"path": ""})
 # @app.route("/<path:path>")
 def catch_all(path):
@@ -0,0 +1,140 @@
+from engine import BatchRunner, Engine
+from engine.batch import BATCH_MODES
+from engine.crawler import close_browser_pool
+from engine.functions.parallel import close_process_pool
+from engine.lighthouse import close_worker_pool
+from quart import Quart, request, send_file, jsonify, render_template
+from server import (
+    artifacts,
+    audit_config,
+    batch_limits,
+    cache,
+    engine_from_values,
+    register,
+    site_crawler_from_values,
+)
+import json
+
+
+# Async version of the API, to be served by an ASGI server such as hypercorn:
+#   hypercorn asgi:app
+# Every request awaits the Engine directly on the server's event loop so audits from
+# different requests overlap without a thread per request.
+app = Quart(__name__, static_folder="dist/static", template_folder="dist")
+register(app)
+
+
+@app.after_serving
+async def shutdown():
+    """Close the browsers and processes shared by the engines when the server stops."""
+    await close_browser_pool()
+    await close_worker_pool()
+    close_process_pool()
+
+
+@app.route("/api/analyze")
+async def get_analysis():
+    target_url = request.args.get("url", default="", type=str)
+    output_format = request.args.get("output", default="json", type=str)
+
+    # Ensure a valid format is given if not, defaults to json
+    if output_format not in ("html", "json"):
+        output_format = "json"
+
+    # The html report is meant to be read by people and defaults to every category
+    config = audit_config(request.args, "full" if output_format == "html" else None)
+
+    engine = Engine(
+        target_url=target_url,
+        audit_format=output_format,
+        audit_config=config,
+        cache=cache,
+        artifacts=artifacts,
+    )
+    await engine.run_analysis()
+
+    if output_format == "json":
+        return jsonify(engine.audit), 200
+    else:
+        return (
+            await send_file(
+                engine.audit,
+                as_attachment=True,
+                attachment_filename=f"awe_analysis.{output_format}",
+            ),
+            200,
+        )
+
+
+@app.route("/api/crawl")
+async def crawl():
+    target_url = request.args.get("url", default="", type=str)
+
+    engine = Engine(target_url=target_url)
+    await engine.run_crawler()
+
+    return (
+        await send_file(
+            engine.site_html,
+            as_attachment=True,
+            attachment_filename="awe_site_crawl.html",
+        ),
+        200,
+    )
+
+
+@app.route("/api/run_engine")
+async def awe():
+    engine = engine_from_values(request.args)
+    await engine.run_engine()
+
+    return (
+        await send_file(
+            engine.accessible_site,
+            as_attachment=True,
+            attachment_filename="awe_site.html",
+        ),
+        200,
+    )
+
+
+@app.route("/api/batch", methods=["POST"])
+async def batch():
+    """
+    Run the Engine on a list of URLs. The JSON body holds the "urls", the "mode"
+    (analyze or run_engine) and optionally the "concurrency" and "per_host" limits.
+    Results are streamed back as JSON lines as soon as each URL is done.
+    """
+    body = await request.get_json(force=True, silent=True) or {}
+    urls = body.get("urls")
+    mode = body.get("mode", "analyze")
+    if not isinstance(urls, list) or mode not in BATCH_MODES:
+        return jsonify({"error": "Expected a list of urls and a valid mode"}), 400
+
+    runner = BatchRunner(
+        mode=mode,
+        **batch_limits(body),
+        engine_options={"cache": cache, "artifacts": artifacts},
+    )
+
+    async def stream_results():
+        async for result in runner.run(urls):
+            yield (json.dumps(result) + "\n").encode()
+
+    return stream_results(), 200, {"Content-Type": "application/x-ndjson"}
+
+
+@app.route("/api/site")
+async def site():
+    """
+    Run the Engine on every page of the site found from its sitemap and links, at most
+    "max_pages" of them. The accessible pages and the report are written to the
+    results folder and the report is sent back.
+    """
+    site_crawler = site_crawler_from_values(request.args)
+    return jsonify(await site_crawler.run()), 200
+
+
+@app.route("/", defaults={"path": ""})
+async def catch_all(path):
+    return await render_template("index.html")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+"""
+Compares the HTML parser backends AWE can use.
+
+Times parsing, searching and serializing pages built from the node snippets of the
+engine/lighthouse/audit.json fixture as well as larger synthetic pages.
+
+    python -m benchmarks.parsers [repeat]
+"""
+
+from engine import soup
+from pathlib import Path
+import json
+import sys
+import timeit
+
+AUDIT_FILE = Path(__file__).resolve().parent.parent.joinpath(
+    "engine/lighthouse/audit.json"
+)
+
+PAGE = "<!DOCTYPE html><html><head><title>AWE</title></head><body>{}</body></html>"
+
+
+def fixture_page():
+    """Page made of every node snippet reported in the audit fixture."""
+    with open(AUDIT_FILE, "r") as audit_file:
+        audits = json.load(audit_file)["audits"]
+
+    snippets = [
+        item["node"]["snippet"]
+        for audit in audits.values()
+        for item in audit.get("details", {}).get("items", [])
+        if isinstance(item, dict) and "node" in item
+    ]
+    return PAGE.format("".join(snippets))
+
+
+def synthetic_page(sections):
+    """Page with the given number of sections of typical content."""
+    section = (
+        '<section class="card" id="s{0}">\n'
+        '  <h2 style="color: #777">Section {0}</h2>\n'
+        '  <p>Some <a href="/page/{0}">text</a>, <b>bold</b> and <i>italic</i>.</p>\n'
+        '  <img src="/img/{0}.png">\n'
+        '  <ul><li>one</li><li>two</li><li><a href="#s{0}">three</a></li></ul>\n'
+        "</section>\n"
+    )
+    return PAGE.format("".join(section.format(i) for i in range(sections)))
+
+
+def benchmark(name, markup, parsers, repeat):
+    print(f"\n{name} ({len(markup) // 1024} KB)")
+    print(f"{'parser':<12}{'parse':>12}{'find':>12}{'serialize':>12}")
+
+    for parser in parsers:
+        document = soup.make_soup(markup, parser)
+        parse = timeit.timeit(lambda: soup.make_soup(markup, parser), number=repeat)
+        find = timeit.timeit(
+            lambda: (document.find_all("a"), document.find_all(["img", "meta"])),
+            number=repeat,
+        )
+        serialize = timeit.timeit(document.encode, number=repeat)
+
+        print(
+            f"{parser:<12}{parse / repeat * 1000:>10.2f}ms"
+            f"{find / repeat * 1000:>10.2f}ms{serialize / repeat * 1000:>10.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    REPEAT = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    available = []
+    for parser in soup.PARSERS:
+        try:
+            soup.set_parser(parser)
+            available.append(parser)
+        except ValueError:
+            print(f"Skipping {parser}, its library is not installed")
+
+    benchmark("audit.json fixture", fixture_page(), available, REPEAT)
+    for sections in (100, 1000, 5000):
+        benchmark(f"{sections} sections", synthetic_page(sections), available, REPEAT)
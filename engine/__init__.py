@@ -1,3 +1,5 @@
 from .engine import Engine
+from .batch import BatchRunner
+from .site import SiteCrawler
 
-__all__ = ["Engine"]
+__all__ = ["BatchRunner", "Engine", "SiteCrawler"]
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+
+"""
+Admission control for the work that starts browsers and Lighthouse processes.
+
+Every crawl opens a Chromium page and every audit runs Lighthouse with its own Chrome,
+under load they can take all of the host's memory and make every run fail at once.
+Before starting either, the work asks the controller for a slot. It waits in a
+bounded queue while the cap for its kind is reached or while the host is short on
+memory, and is rejected once the queue is full or it has waited too long, so that the
+server can answer 503 with a Retry-After instead of failing everything.
+"""
+
+
+from contextlib import asynccontextmanager
+import asyncio
+import math
+import os
+import time
+
+BROWSER = "browser"
+LIGHTHOUSE = "lighthouse"
+
+# Seconds between two checks of the available memory while it is too low
+MEMORY_POLL_INTERVAL = 0.5
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when work can't be admitted, the server should answer 503.
+
+    Parameters:
+        message <str> Reason of the rejection
+        retry_after <int> Seconds after which the work is likely to be admitted
+    """
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Gate:
+    """Cap and statistics of one kind of work."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_held = 0.0
+        self.released = 0
+        # Futures of the queued work, set when a slot is released
+        self.waiters = []
+
+    def to_dict(self):
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "average_wait": self.total_wait / self.admitted if self.admitted else 0,
+            "max_wait": self.max_wait,
+        }
+
+
+class AdmissionController:
+    """
+    Caps the number of crawls and audits running at once and holds them back while
+    the host is short on memory.
+
+    Parameters:
+        max_browsers <int> Maximum number of crawls running at once
+        max_audits <int> Maximum number of Lighthouse audits running at once
+        min_memory <int> Bytes of memory that must be available to start work, the
+                         memory isn't checked if 0 or if the host doesn't report it
+        max_queue <int> Maximum number of waiting crawls, and of waiting audits
+        timeout <int> Seconds work can wait before being rejected
+
+    Properties:
+        stats <dict> Limits, queue depth and wait times of every kind of work
+    """
+
+    def __init__(
+        self, *, max_browsers=4, max_audits=2, min_memory=0, max_queue=32, timeout=60
+    ):
+        self._gates = {BROWSER: _Gate(max_browsers), LIGHTHOUSE: _Gate(max_audits)}
+        self._min_memory = min_memory
+        self._max_queue = max_queue
+        self._timeout = timeout
+
+    @property
+    def stats(self):
+        stats = {kind: gate.to_dict() for kind, gate in self._gates.items()}
+        stats["available_memory"] = available_memory()
+        return stats
+
+    @asynccontextmanager
+    async def slot(self, kind):
+        """
+        Wait until the work can start and hold its slot until exit.
+
+        Parameters:
+            kind <str> Kind of the work, BROWSER or LIGHTHOUSE
+
+        Raise:
+            <AdmissionRejected> If the queue is full or the work waited too long
+        """
+        gate = self._gates[kind]
+        started_at = time.monotonic()
+        if gate.active < gate.limit and not gate.queued and self._has_memory():
+            gate.active += 1
+        else:
+            await self._wait(kind, gate)
+
+        admitted_at = time.monotonic()
+        wait = admitted_at - started_at
+        gate.admitted += 1
+        gate.total_wait += wait
+        gate.max_wait = max(gate.max_wait, wait)
+        try:
+            yield
+        finally:
+            gate.total_held += time.monotonic() - admitted_at
+            gate.released += 1
+            gate.active -= 1
+            for waiter in gate.waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+
+    async def _wait(self, kind, gate):
+        """Wait in the queue of the gate until the work is admitted."""
+        if gate.queued >= self._max_queue:
+            gate.rejected += 1
+            raise AdmissionRejected(
+                f"{gate.queued} {kind} runs are already waiting",
+                self._retry_after(gate),
+            )
+
+        gate.queued += 1
+        try:
+            admitted = await self._admit(gate, time.monotonic() + self._timeout)
+        finally:
+            gate.queued -= 1
+
+        if not admitted:
+            gate.rejected += 1
+            raise AdmissionRejected(
+                f"Waited more than {self._timeout}s to start a {kind} run",
+                self._retry_after(gate),
+            )
+
+    async def _admit(self, gate, deadline):
+        """
+        Take a slot of the gate once one is free and the host has enough memory.
+
+        Waiters are woken by futures rather than a condition with a timeout, which
+        loses the condition's lock when cancelled on Python 3.7.
+
+        Return:
+            <bool> Whether the work was admitted before the deadline
+        """
+        while True:
+            if gate.active < gate.limit and self._has_memory():
+                gate.active += 1
+                return True
+
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                return False
+            if gate.active < gate.limit:
+                # Nothing to be woken by, memory frees up on its own
+                timeout = min(timeout, MEMORY_POLL_INTERVAL)
+
+            waiter = asyncio.get_event_loop().create_future()
+            gate.waiters.append(waiter)
+            try:
+                await asyncio.wait([waiter], timeout=timeout)
+            finally:
+                gate.waiters.remove(waiter)
+
+    def _has_memory(self):
+        if not self._min_memory:
+            return True
+        memory = available_memory()
+        return memory is None or memory >= self._min_memory
+
+    def _retry_after(self, gate):
+        """Seconds until the work waiting now is likely to have gone through."""
+        if not gate.released:
+            return math.ceil(self._timeout)
+        average_held = gate.total_held / gate.released
+        return max(1, math.ceil(average_held * (gate.queued + 1) / gate.limit))
+
+
+def available_memory():
+    """
+    Get the memory the host can give to new processes without swapping.
+
+    Return:
+        <int> Available bytes or None if the host doesn't report it
+    """
+    try:
+        with open("/proc/meminfo") as meminfo:
+            for line in meminfo:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+_admission_controller = None
+
+
+def get_admission_controller():
+    """
+    Get the admission controller shared by the whole process. It is set with the
+    AWE_MAX_CRAWLS, AWE_MAX_AUDITS, AWE_MIN_MEMORY_MB, AWE_ADMISSION_QUEUE and
+    AWE_ADMISSION_TIMEOUT environment variables.
+
+    Return:
+        <AdmissionController> The shared admission controller
+    """
+    global _admission_controller
+    if _admission_controller is None:
+        _admission_controller = AdmissionController(
+            max_browsers=int(os.environ.get("AWE_MAX_CRAWLS") or 4),
+            max_audits=int(
+                os.environ.get("AWE_MAX_AUDITS")
+                or os.environ.get("AWE_LIGHTHOUSE_WORKERS")
+                or 2
+            ),
+            min_memory=int(os.environ.get("AWE_MIN_MEMORY_MB") or 0) * 2 ** 20,
+            max_queue=int(os.environ.get("AWE_ADMISSION_QUEUE") or 32),
+            timeout=int(os.environ.get("AWE_ADMISSION_TIMEOUT") or 60),
+        )
+    return _admission_controller
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+
+"""
+Audits the rules that can be checked on the HTML of a page alone, without a browser.
+
+The parsed page is walked once, the rules are then evaluated on the tags that were
+collected. The result is laid out like the pruned Lighthouse response, failing
+elements have the snippet, selector and path Lighthouse would give them, so that it
+goes through the ResponseParser and the rest of the Engine unchanged.
+"""
+
+
+from . import constants
+from bs4.element import NavigableString, Tag
+from collections import Counter
+import re
+
+DESCRIPTIONS = {
+    "accesskeys": (
+        "Access keys let users quickly focus a part of the page. For proper "
+        "navigation, each access key must be unique."
+    ),
+    "definition-list": (
+        "When definition lists are not properly marked up, screen readers may "
+        "produce confusing or inaccurate output."
+    ),
+    "document-title": (
+        "The title gives screen reader users an overview of the page, and search "
+        "engine users rely on it heavily to determine if a page is relevant."
+    ),
+    "duplicate-id": (
+        "The value of an id attribute must be unique to prevent other instances from "
+        "being overlooked by assistive technologies."
+    ),
+    "html-lang": (
+        "If a page doesn't specify a lang attribute, a screen reader assumes that the "
+        "page is in the default language of the screen reader."
+    ),
+    "image-alt": (
+        "Informative elements should aim for short, descriptive alternate text. "
+        "Decorative elements can be ignored with an empty alt attribute."
+    ),
+    "meta-refresh": (
+        "Users do not expect a page to refresh automatically, and doing so will move "
+        "focus back to the top of the page."
+    ),
+    "meta-viewport": (
+        "Disabling zooming is problematic for users with low vision who rely on "
+        "screen magnification to properly see the contents of a web page."
+    ),
+}
+
+# Children a <dl> may have besides its dt and dd groups
+_DL_CHILDREN = ("dd", "div", "dt", "script", "template")
+_DL_GROUP_CHILDREN = ("dd", "dt", "script", "template")
+
+_REFRESH_DELAY = re.compile(r"\s*(\d+(?:\.\d*)?)")
+# Refreshes delayed by 20 hours or more are accepted, as by axe
+_MAX_REFRESH_DELAY = 72000
+
+# Pages must let users zoom at least this much, as in Lighthouse
+_MIN_MAXIMUM_SCALE = 5
+
+
+def audit(html, function_names=constants.NATIVE_FUNCTIONS):
+    """
+    Audit the page on the given rules.
+
+    The category score is the share of the applicable rules the page passes, it is
+    only comparable with the scores of other native audits.
+
+    Parameters:
+        html <BeautifulSoup> Parsed HTML of the whole page
+        function_names <list> Rules to check, amongst constants.NATIVE_FUNCTIONS
+
+    Return:
+        <dict> Lighthouse response with the accessibility score and the audits of the
+               rules, in the same layout as the full report
+    """
+    page = _collect(html)
+
+    audits = {}
+    for name in function_names:
+        failing = RULES[name](page)
+        if failing is None:
+            # Nothing on the page the rule applies to
+            score = None
+        else:
+            score = 0 if failing else 1
+        audits[name] = {
+            "score": score,
+            "description": DESCRIPTIONS[name],
+            "details": {
+                "items": [
+                    {"node": _node_details(node, page["places"])}
+                    for node in failing or []
+                ]
+            },
+        }
+
+    scores = [data["score"] for data in audits.values() if data["score"] is not None]
+    return {
+        "categories": {
+            "accessibility": {"score": sum(scores) / len(scores) if scores else 1}
+        },
+        "audits": audits,
+    }
+
+
+def image_alt(page):
+    """Images without any alternative text, unless they are marked as decorative."""
+    images = page["tags"].get("img")
+    if not images:
+        return None
+
+    return [
+        image
+        for image in images
+        if not image.has_attr("alt")
+        and image.get("role", "").strip().lower() not in ("none", "presentation")
+        and not any(
+            image.get(attribute, "").strip()
+            for attribute in ("aria-label", "aria-labelledby", "title")
+        )
+    ]
+
+
+def html_lang(page):
+    """The <html> element when it has no lang attribute."""
+    root = _root(page)
+    if root is None:
+        return None
+    return [] if root.get("lang", "").strip() else [root]
+
+
+def document_title(page):
+    """The <html> element when the document has no title with text."""
+    root = _root(page)
+    if root is None:
+        return None
+    titles = page["tags"].get("title", [])
+    return [] if any(title.get_text().strip() for title in titles) else [root]
+
+
+def meta_viewport(page):
+    """Viewport <meta> tags that disable zooming or limit it to less than 5 times."""
+    metas = [
+        meta
+        for meta in page["tags"].get("meta", [])
+        if meta.get("name", "").lower() == "viewport"
+    ]
+    if not metas:
+        return None
+
+    failing = []
+    for meta in metas:
+        properties = {}
+        for declaration in re.split(r"[,;]", meta.get("content", "")):
+            name, _, value = declaration.partition("=")
+            properties[name.strip().lower()] = value.strip().lower()
+
+        try:
+            scale = float(properties.get("maximum-scale", _MIN_MAXIMUM_SCALE))
+        except ValueError:
+            scale = _MIN_MAXIMUM_SCALE
+        if properties.get("user-scalable") in ("no", "0") or scale < _MIN_MAXIMUM_SCALE:
+            failing.append(meta)
+    return failing
+
+
+def meta_refresh(page):
+    """
+    Refresh <meta> tags that reload or redirect the page after a delay short enough
+    for users to be interrupted.
+    """
+    metas = [
+        meta
+        for meta in page["tags"].get("meta", [])
+        if meta.get("http-equiv", "").lower() == "refresh"
+    ]
+    if not metas:
+        return None
+
+    failing = []
+    for meta in metas:
+        delay = _REFRESH_DELAY.match(meta.get("content", ""))
+        if delay and 0 < float(delay.group(1)) < _MAX_REFRESH_DELAY:
+            failing.append(meta)
+    return failing
+
+
+def duplicate_id(page):
+    """Elements whose id is used by another element."""
+    return _duplicates(page["ids"])
+
+
+def accesskeys(page):
+    """Elements whose accesskey is used by another element."""
+    return _duplicates(page["accesskeys"])
+
+
+def definition_list(page):
+    """Lists that hold something else than dt and dd groups."""
+    lists = [dl for dl in page["tags"].get("dl", []) if not dl.has_attr("role")]
+    if not lists:
+        return None
+
+    return [
+        dl
+        for dl in lists
+        if not _only_children(dl, _DL_CHILDREN)
+        or not all(
+            _only_children(div, _DL_GROUP_CHILDREN)
+            for div in dl.find_all("div", recursive=False)
+        )
+    ]
+
+
+RULES = {
+    "accesskeys": accesskeys,
+    "definition-list": definition_list,
+    "document-title": document_title,
+    "duplicate-id": duplicate_id,
+    "html-lang": html_lang,
+    "image-alt": image_alt,
+    "meta-refresh": meta_refresh,
+    "meta-viewport": meta_viewport,
+}
+
+
+def _collect(html):
+    """
+    Walks the page once and collects the tags the rules look at, along with where
+    every tag is amongst its siblings.
+
+    Return:
+        <dict>
+            "tags"          <dict> Lists of the tags by name, in document order
+            "ids"           <list> (<str>, <Tag>) pairs of id and tag, in document order
+            "accesskeys"    <list> (<str>, <Tag>) pairs of lower case accesskey and
+                                   tag, in document order
+            "places"        <dict> Index of the tag amongst its siblings as counted
+                                   by Lighthouse, and its nth-of-type position or None
+                                   if it is the only tag of its name, by id of the tag
+    """
+    tags = {}
+    ids = []
+    keys = []
+    places = {}
+
+    stack = [html]
+    while stack:
+        parent = stack.pop()
+        children = []
+        index = 0
+        for child in parent.contents:
+            if isinstance(child, Tag):
+                children.append((child, index))
+            # Lighthouse does not count white-space only text nodes
+            if not (isinstance(child, NavigableString) and child.isspace()):
+                index += 1
+
+        counts = Counter(child.name for child, _ in children)
+        positions = Counter()
+        for child, index in children:
+            positions[child.name] += 1
+            places[id(child)] = (
+                index,
+                positions[child.name] if counts[child.name] > 1 else None,
+            )
+        # Children are visited in document order
+        stack.extend(child for child, _ in reversed(children))
+
+        if parent is html:
+            continue
+        tags.setdefault(parent.name, []).append(parent)
+        node_id = parent.get("id")
+        if isinstance(node_id, str) and node_id.strip():
+            ids.append((node_id, parent))
+        accesskey = parent.get("accesskey")
+        if accesskey:
+            if isinstance(accesskey, list):
+                accesskey = " ".join(accesskey)
+            keys.append((accesskey.strip().lower(), parent))
+
+    return {"tags": tags, "ids": ids, "accesskeys": keys, "places": places}
+
+
+def _root(page):
+    roots = page["tags"].get("html")
+    return roots[0] if roots else None
+
+
+def _duplicates(pairs):
+    if not pairs:
+        return None
+    counts = Counter(value for value, _ in pairs)
+    return [node for value, node in pairs if counts[value] > 1]
+
+
+def _only_children(node, names):
+    """Whether the children of the node are only tags of the given names."""
+    for child in node.children:
+        if isinstance(child, Tag):
+            if child.name not in names:
+                return False
+        elif type(child) is NavigableString and child.strip():
+            return False
+    return True
+
+
+def _node_details(node, places):
+    """
+    Describes an element the way Lighthouse does.
+
+    Parameters:
+        node <bs4.element.Tag> Element of the page
+        places <dict> Places of the tags of the page, as collected by _collect
+
+    Return:
+        <dict>
+            "snippet"   <str> Start tag of the element
+            "selector"  <str> CSS selector of the element
+            "path"      <str> Path down the page, in the format "1,HTML,1,BODY,0,DIV"
+    """
+    snippet = _start_tag(node)
+
+    path = []
+    selector = []
+    while node.parent is not None:
+        index, position = places[id(node)]
+        path.append(f"{index},{node.name.upper()}")
+        if position is None:
+            selector.append(node.name)
+        else:
+            selector.append(f"{node.name}:nth-of-type({position})")
+        node = node.parent
+
+    return {
+        "snippet": snippet,
+        "selector": " > ".join(reversed(selector)),
+        "path": ",".join(reversed(path)),
+        "explanation": "",
+    }
+
+
+def _start_tag(node):
+    """
+    Writes the start tag of an element as the browser serializes it, with only the
+    ampersands and double quotes of the attribute values escaped.
+    """
+    attributes = []
+    for name, value in node.attrs.items():
+        if isinstance(value, list):
+            value = " ".join(value)
+        value = value.replace("&", "&amp;").replace('"', "&quot;")
+        attributes.append(f' {name}="{value}"')
+    return f"<{node.name}{''.join(attributes)}>"
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+"""
+Runs the Engine over many URLs at once.
+
+A batch is scheduled with a global limit on the number of URLs processed at the same
+time and a tighter limit per host so that a single site is not flooded. Every Engine
+of the batch borrows from the same browser pool, and results are handed back as soon
+as each URL is done rather than once the whole batch is.
+"""
+
+
+from .engine import Engine
+from urllib.parse import urlsplit
+import asyncio
+import json
+
+BATCH_MODES = ("analyze", "run_engine")
+
+
+class BatchRunner:
+    """
+    Schedules Engine runs for a list of URLs.
+
+    Parameters:
+        mode <str> One of BATCH_MODES, the Engine run to do for every URL
+        concurrency <int> Maximum number of URLs processed at the same time
+        per_host <int> Maximum number of URLs of one host processed at the same time
+        engine_options <dict> Keyword arguments given to every Engine, like the cache
+    """
+
+    def __init__(
+        self, *, mode="analyze", concurrency=4, per_host=2, engine_options=None
+    ):
+        if mode not in BATCH_MODES:
+            raise ValueError(f"Unknown batch mode {mode}")
+
+        self._mode = mode
+        self._concurrency = concurrency
+        self._per_host = per_host
+        self._engine_options = engine_options or {}
+
+    async def run(self, urls):
+        """
+        Process every URL, duplicates are only processed once.
+
+        Parameters:
+            urls <list> URLs to process
+
+        Yield:
+            <dict> Result of a URL as soon as it is done, see _run_url
+        """
+        slots = asyncio.Semaphore(self._concurrency)
+        host_slots = {}
+
+        tasks = []
+        for url in dict.fromkeys(urls):
+            host = urlsplit(url).netloc.lower()
+            if host not in host_slots:
+                host_slots[host] = asyncio.Semaphore(self._per_host)
+            tasks.append(
+                asyncio.ensure_future(self._run_url(url, slots, host_slots[host]))
+            )
+
+        try:
+            for result in asyncio.as_completed(tasks):
+                yield await result
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def run_all(self, urls):
+        """
+        Process every URL and wait for the whole batch.
+
+        Return:
+            <list> Results in the order the URLs finished in
+        """
+        return [result async for result in self.run(urls)]
+
+    async def _run_url(self, url, slots, host_slots):
+        """
+        Run the Engine on the URL once both its host and the batch have room for it.
+
+        Return:
+            <dict> Result of the URL:
+                "url"       <str> The URL
+                "score"     <float> Lighthouse accessibility score
+                "audit"     <dict> Parsed audit, for the analyze mode
+                "html"      <str> Accessible version of the page, for run_engine
+                "error"     <str> Reason the URL failed, None if it did not
+        """
+        result = {"url": url, "score": None, "error": None}
+
+        # Host first, so that waiting on a busy host doesn't hold a batch slot
+        async with host_slots, slots:
+            engine = Engine(target_url=url, **self._engine_options)
+            try:
+                if self._mode == "analyze":
+                    await engine.run_analysis()
+                    result["audit"] = json.loads(engine.audit)
+                else:
+                    await engine.run_engine()
+                    result["html"] = engine.accessible_site.getvalue().decode()
+                result["score"] = engine.score
+            except Exception as e:
+                result["error"] = f"{type(e).__name__}: {e}"
+
+        return result
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+
+"""
+Content addressed cache for the results of the Engine.
+
+Entries are kept pickled in a size bounded, least recently used memory tier and can
+be written through to a directory on disk so that they survive restarts. Every entry
+expires after the cache's time to live.
+"""
+
+
+from collections import OrderedDict
+from hashlib import sha256
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit
+import json
+import pickle
+import threading
+import time
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+class Cache:
+    """
+    Two tier cache, values are stored pickled so every hit returns a fresh copy that
+    the caller is free to modify.
+
+    Parameters:
+        ttl <int> Seconds an entry stays valid
+        max_size <int> Maximum size in bytes of the pickled entries kept in memory
+        directory <Path> Directory of the on-disk tier, no disk tier if None
+        max_disk_size <int> Maximum size in bytes of the entries kept on disk, only
+                            bounded by their time to live if None
+
+    Properties:
+        size <int> Size in bytes of the entries kept in memory
+        disk_size <int> Size in bytes of the entries this process knows are on disk
+    """
+
+    def __init__(
+        self, *, ttl=3600, max_size=64 * 2 ** 20, directory=None, max_disk_size=None
+    ):
+        self._ttl = ttl
+        self._max_size = max_size
+        self._directory = Path(directory) if directory else None
+        self._max_disk_size = max_disk_size
+
+        # key -> (expiry time, pickled value)
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+        # key -> (write time, size) of the files of the disk tier, oldest first, so
+        # that writes don't have to list the directory
+        self._disk_entries = OrderedDict()
+        self._disk_size = 0
+
+        if self._directory is not None:
+            self._directory.mkdir(parents=True, exist_ok=True)
+            self._index_disk()
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def disk_size(self):
+        return self._disk_size
+
+    def get(self, key):
+        """
+        Get the value stored for the key.
+
+        Parameters:
+            key <str> Key as made by make_key
+
+        Return:
+            Copy of the stored value or None if there is no valid entry for the key
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.time():
+                    self._entries.move_to_end(key)
+                    return pickle.loads(entry[1])
+                self._drop(key)
+
+        data, expires = self._read_disk(key)
+        if data is None:
+            return None
+
+        with self._lock:
+            self._store(key, data, expires)
+        return pickle.loads(data)
+
+    def set(self, key, value):
+        """
+        Store the value for the key, evicting the least recently used entries if the
+        cache grows over its maximum size.
+
+        Parameters:
+            key <str> Key as made by make_key
+            value Any picklable value
+        """
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+        with self._lock:
+            self._store(key, data, time.time() + self._ttl)
+
+        self._write_disk(key, data)
+
+    def clear(self):
+        """Remove every entry from both tiers."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+        if self._directory is not None:
+            with self._lock:
+                self._disk_entries.clear()
+                self._disk_size = 0
+            for path in self._directory.glob("*.pickle"):
+                path.unlink()
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _store(self, key, data, expires):
+        if key in self._entries:
+            self._drop(key)
+
+        # Entries bigger than the whole cache would only evict everything else
+        if len(data) > self._max_size:
+            return
+
+        self._entries[key] = (expires, data)
+        self._size += len(data)
+
+        while self._size > self._max_size:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, key):
+        _, data = self._entries.pop(key)
+        self._size -= len(data)
+
+    def _disk_path(self, key):
+        return Path(self._directory, f"{key}.pickle")
+
+    def _read_disk(self, key):
+        """Return the pickled value stored on disk with its expiry time."""
+        if self._directory is None:
+            return None, None
+
+        path = self._disk_path(key)
+        try:
+            expires = path.stat().st_mtime + self._ttl
+            if expires <= time.time():
+                path.unlink()
+                with self._lock:
+                    self._forget_disk(key)
+                return None, None
+            return path.read_bytes(), expires
+        except FileNotFoundError:
+            return None, None
+
+    def _write_disk(self, key, data):
+        if self._directory is None:
+            return
+
+        # Write then rename so readers never see a partially written entry
+        path = self._disk_path(key)
+        partial = path.with_suffix(f".{threading.get_ident()}.tmp")
+        partial.write_bytes(data)
+        partial.replace(path)
+
+        with self._lock:
+            self._forget_disk(key)
+            self._disk_entries[key] = (time.time(), len(data))
+            self._disk_size += len(data)
+            evicted = self._evict_disk()
+
+        for evicted_key in evicted:
+            try:
+                self._disk_path(evicted_key).unlink()
+            except FileNotFoundError:
+                # Removed by another thread or process sharing the directory
+                pass
+
+    def _evict_disk(self):
+        """
+        Take the expired entries, then the oldest ones until the disk tier fits in its
+        maximum size, out of the index of the disk tier.
+
+        Return:
+            <list> Keys of the entries whose files are to be removed
+        """
+        expired_before = time.time() - self._ttl
+        evicted = []
+        while self._disk_entries:
+            key, (written_at, size) = next(iter(self._disk_entries.items()))
+            if written_at > expired_before and (
+                self._max_disk_size is None or self._disk_size <= self._max_disk_size
+            ):
+                break
+            self._forget_disk(key)
+            evicted.append(key)
+        return evicted
+
+    def _forget_disk(self, key):
+        entry = self._disk_entries.pop(key, None)
+        if entry is not None:
+            self._disk_size -= entry[1]
+
+    def _index_disk(self):
+        """Index the files left in the disk tier by previous runs, oldest first."""
+        files = []
+        for path in self._directory.glob("*.pickle"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, path.stem, stat.st_size))
+
+        for written_at, key, size in sorted(files):
+            self._disk_entries[key] = (written_at, size)
+            self._disk_size += size
+
+
+def normalize_url(url):
+    """
+    Normalize the URL so that equivalent addresses share their cache entries.
+    The scheme and host are lower cased, default ports and fragments are dropped.
+
+    Parameters:
+        url <str> URL to normalize
+
+    Return:
+        <str> Normalized URL
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+
+    try:
+        port = parts.port
+    except ValueError:
+        # Ports out of range or not numbers, the address is kept as given
+        netloc = parts.netloc
+    else:
+        netloc = (parts.hostname or "").lower()
+        if port and port != DEFAULT_PORTS.get(scheme):
+            netloc += f":{port}"
+        if parts.username:
+            netloc = f"{parts.username}@{netloc}"
+
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+
+
+def make_key(*parts):
+    """
+    Make a cache key out of JSON serializable parts.
+
+    Return:
+        <str> Hexadecimal digest of the parts
+    """
+    return sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+def hash_content(content):
+    """
+    Parameters:
+        content <bytes> Content to hash, such as the crawled HTML
+
+    Return:
+        <str> Hexadecimal digest of the content
+    """
+    return sha256(content).hexdigest()
@@ -10,11 +10,8 @@ INDIRECT_FUNCTIONS = [
     "bypass",
     "color-contrast",
     "definition-list",
-    "dlitem",
-    "document-title",
     "duplicate-id",
     "frame-title",
-    "html-lang",
     "html-lang-valid",
     "image-alt",
     "input-image-alt",
@@ -34,6 +31,21 @@ INDIRECT_FUNCTIONS = [
 ]
 
 # Functions that work by directly modifying the original HTML
-DIRECT_FUNCTIONS = ["meta-refresh"]
+DIRECT_FUNCTIONS = ["dlitem", "document-title", "html-lang", "meta-refresh"]
 
 AWE_FUNCTIONS = INDIRECT_FUNCTIONS + DIRECT_FUNCTIONS
+
+# Functions whose failing tags can be found from the HTML alone, without Lighthouse
+NATIVE_FUNCTIONS = [
+    "accesskeys",
+    "definition-list",
+    "document-title",
+    "duplicate-id",
+    "html-lang",
+    "image-alt",
+    "meta-refresh",
+    "meta-viewport",
+]
+
+# Functions that need the whole page to fix their tags, they can't be split up
+PAGE_FUNCTIONS = ["accesskeys"]
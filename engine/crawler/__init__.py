@@ -1,3 +1,17 @@
+from engine.crawler.browser_pool import (
+    BrowserPool,
+    get_browser_pool,
+    close_browser_pool,
+)
 from engine.crawler.crawler import Crawler
+from engine.crawler.path_index import PathIndex
+from engine.crawler.source_map import SourceMap
 
-__all__ = ["Crawler"]
+__all__ = [
+    "BrowserPool",
+    "Crawler",
+    "PathIndex",
+    "SourceMap",
+    "close_browser_pool",
+    "get_browser_pool",
+]
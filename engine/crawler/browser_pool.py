@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+
+"""
+Pool of long-lived headless browsers shared by every Crawler of the process.
+
+Launching Chromium is the largest fixed cost of a crawl, the pool keeps a few browsers
+alive and hands out fresh pages from them instead. Browsers left idle are health
+checked before use and recycled once they have served enough pages or after a crash.
+"""
+
+
+from ..metrics import timer
+from contextlib import asynccontextmanager
+from pyppeteer import launch
+from urllib.parse import urlparse
+import asyncio
+import os
+import time
+
+
+LAUNCH_OPTIONS = {"handleSIGINT": False, "handleSIGTERM": False, "handleSIGHUP": False}
+
+# Seconds given to a browser to answer the health check
+HEALTH_CHECK_TIMEOUT = 5
+
+# Seconds a browser can stay idle before being health checked, busy browsers are
+# known to work
+HEALTH_CHECK_IDLE = 10
+
+
+class _PooledBrowser:
+    """Book keeping of a browser owned by the pool."""
+
+    def __init__(self, browser):
+        self.browser = browser
+        self.pages_served = 0
+        self.active_pages = 0
+        self.idle_since = time.monotonic()
+        self.broken = False
+
+
+class BrowserPool:
+    """
+    Keeps up to `size` browsers alive and lends pages from them, pages wait for a
+    browser when every one of them is done serving pages but still has some open, or
+    while the last browsers are being launched.
+
+    Parameters:
+        size <int> Maximum number of browsers kept alive at once
+        max_pages <int> Number of pages a browser serves before being recycled
+        launch_options <dict> Options given to pyppeteer when launching a browser
+
+    Properties:
+        browsers <int> Number of browsers currently alive
+    """
+
+    def __init__(self, *, size=2, max_pages=50, launch_options=None):
+        self._size = size
+        self._max_pages = max_pages
+        self._launch_options = launch_options or LAUNCH_OPTIONS
+        self._browsers = []
+        # Browsers being launched, they count towards the size of the pool
+        self._launching = 0
+        self._released = None
+
+    @property
+    def browsers(self):
+        return len(self._browsers)
+
+    @asynccontextmanager
+    async def page(self):
+        """
+        Borrow a new page from one of the pool's browsers, the page is closed and
+        given back to the pool on exit.
+
+        Yield:
+            <pyppeteer.page.Page> Blank page ready for navigation
+        """
+        pooled, page = await self.acquire_page()
+        failed = False
+        try:
+            yield page
+        except Exception:
+            failed = True
+            raise
+        finally:
+            await self.release_page(pooled, page, failed=failed)
+
+    async def acquire_page(self):
+        """
+        Open a new page on the least busy healthy browser, launching a browser if
+        none is available and the pool is not full.
+
+        Return:
+            <tuple>(<_PooledBrowser>, <pyppeteer.page.Page>) Owner and page
+        """
+        released = self._get_released()
+        while True:
+            # Launches and health checks are made without holding up other borrowers
+            async with released:
+                pooled, check = await self._reserve()
+
+            if pooled is None:
+                pooled = await self._launch()
+            elif check:
+                healthy = False
+                try:
+                    healthy = await self._is_healthy(pooled)
+                finally:
+                    if not healthy:
+                        # Give back the page reserved on it, even when cancelled
+                        pooled.pages_served -= 1
+                        pooled.active_pages -= 1
+                if not healthy:
+                    pooled.broken = True
+                    await self._recycle(pooled)
+                    await self._notify_released()
+                    continue
+            break
+
+        try:
+            page = await pooled.browser.newPage()
+        except Exception:
+            pooled.active_pages -= 1
+            pooled.broken = True
+            await self._recycle(pooled)
+            await self._notify_released()
+            raise
+
+        return pooled, page
+
+    async def release_page(self, pooled, page, failed=False):
+        """
+        Close a borrowed page and recycle its browser if it has served enough pages
+        or if something went wrong while using it.
+
+        Parameters:
+            pooled <_PooledBrowser> Owner of the page
+            page <pyppeteer.page.Page> Page to close
+            failed <bool> Whether the page was being used when an error happened
+        """
+        pooled.active_pages -= 1
+        if not pooled.active_pages:
+            pooled.idle_since = time.monotonic()
+        try:
+            await page.close()
+        except Exception:
+            pooled.broken = True
+
+        if failed and not await self._is_healthy(pooled):
+            pooled.broken = True
+
+        if pooled.broken or pooled.pages_served >= self._max_pages:
+            await self._recycle(pooled)
+        await self._notify_released()
+
+    async def close(self):
+        """Close every browser of the pool."""
+        browsers, self._browsers = self._browsers, []
+        for pooled in browsers:
+            await self._close_browser(pooled.browser)
+
+    def _get_released(self):
+        # Created lazily so that it is bound to the loop the pool is used in
+        if self._released is None:
+            self._released = asyncio.Condition()
+        return self._released
+
+    async def _notify_released(self):
+        released = self._get_released()
+        async with released:
+            released.notify_all()
+
+    async def _reserve(self):
+        """
+        Reserve a page on the least busy browser, or a launch if the pool isn't full.
+        Called with the released condition held, waits on it when no browser can
+        serve a page.
+
+        Return:
+            <tuple>(<_PooledBrowser>, <bool>) Browser the page is reserved on, None
+                                              for a launch, and whether it needs a
+                                              health check as it was left idle
+        """
+        while True:
+            has_room = len(self._browsers) + self._launching < self._size
+            candidates = sorted(
+                (
+                    pooled
+                    for pooled in self._browsers
+                    if not pooled.broken and pooled.pages_served < self._max_pages
+                ),
+                key=lambda pooled: pooled.active_pages,
+            )
+
+            if candidates and not (candidates[0].active_pages and has_room):
+                pooled = candidates[0]
+                # Checking every browser would hold up every page behind a round trip
+                check = (
+                    not pooled.active_pages
+                    and time.monotonic() - pooled.idle_since >= HEALTH_CHECK_IDLE
+                )
+                pooled.pages_served += 1
+                pooled.active_pages += 1
+                return pooled, check
+
+            if has_room:
+                # Busy browsers or none at all, spread the load on a new one
+                self._launching += 1
+                return None, False
+
+            # Browsers done serving pages are closed once their last page is
+            await self._released.wait()
+
+    async def _launch(self):
+        """Launch the browser reserved by _reserve, with a page reserved on it."""
+        pooled = None
+        try:
+            with timer("browser_launch"):
+                pooled = _PooledBrowser(await launch(**self._launch_options))
+            pooled.pages_served += 1
+            pooled.active_pages += 1
+        finally:
+            # Publish the browser, or give the slot back if the launch failed
+            async with self._released:
+                self._launching -= 1
+                if pooled is not None:
+                    self._browsers.append(pooled)
+                self._released.notify_all()
+        return pooled
+
+    async def _is_healthy(self, pooled):
+        try:
+            await asyncio.wait_for(pooled.browser.version(), HEALTH_CHECK_TIMEOUT)
+        except Exception:
+            return False
+        return True
+
+    async def _recycle(self, pooled):
+        """Take the browser out of the pool and close it once its pages are done."""
+        if pooled in self._browsers and (pooled.broken or not pooled.active_pages):
+            self._browsers.remove(pooled)
+
+        if pooled not in self._browsers and not pooled.active_pages:
+            await self._close_browser(pooled.browser)
+
+    async def _close_browser(self, browser):
+        try:
+            await browser.close()
+        except Exception:
+            # Crashed browsers have nothing left to close
+            pass
+
+
+def debugging_port(browser):
+    """
+    Get the remote debugging port of a browser so that other tools, like Lighthouse,
+    can connect to it.
+
+    Parameters:
+        browser <pyppeteer.browser.Browser> Browser launched by pyppeteer
+
+    Return:
+        <int> Port the browser's DevTools protocol listens on
+    """
+    return urlparse(browser.wsEndpoint).port
+
+
+def target_id(page):
+    """
+    Get the id of the DevTools target of a page, other tools connected to its browser
+    find the page with it.
+
+    Parameters:
+        page <pyppeteer.page.Page> Page opened by pyppeteer
+
+    Return:
+        <str> Id of the target of the page
+    """
+    # pyppeteer keeps the id private, but it is the one of the DevTools protocol
+    return page.target._targetId
+
+
+_browser_pool = None
+
+
+def get_browser_pool():
+    """
+    Get the browser pool shared by the whole process, its size and the number of
+    pages per browser can be set with the AWE_BROWSER_POOL_SIZE and
+    AWE_BROWSER_MAX_PAGES environment variables.
+
+    Return:
+        <BrowserPool> The shared browser pool
+    """
+    global _browser_pool
+    if _browser_pool is None:
+        _browser_pool = BrowserPool(
+            size=int(os.environ.get("AWE_BROWSER_POOL_SIZE") or 2),
+            max_pages=int(os.environ.get("AWE_BROWSER_MAX_PAGES") or 50),
+        )
+    return _browser_pool
+
+
+async def close_browser_pool():
+    """Close the browsers of the shared pool, meant to be called on shutdown."""
+    global _browser_pool
+    if _browser_pool is not None:
+        await _browser_pool.close()
+        _browser_pool = None
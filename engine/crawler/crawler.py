@@ -6,9 +6,14 @@ keep a BeautifulSoup object version.
 """
 
 
-from bs4 import BeautifulSoup
+from .browser_pool import debugging_port, get_browser_pool, target_id
+from .path_index import PathIndex
+from .source_map import SourceMap
+from ..admission import BROWSER, get_admission_controller
+from ..metrics import timer
+from ..soup import make_soup
+from contextlib import asynccontextmanager
 from io import BytesIO
-from pyppeteer import launch
 
 
 class Crawler:
@@ -19,16 +24,25 @@ class Crawler:
 
     Parameters:
         target_url <str> URL of the site to crawl
+        browser_pool <BrowserPool> Pool to borrow pages from, defaults to the shared one
+        admission <AdmissionController> Controller admitting the crawls, defaults to
+                                        the shared one
 
     Properties:
         raw_html <str> Scraped HTML as a BytesIO file-like format for transfers
         html_soup <BeautifulSoup> Parsed HTML of the site
+        path_index <PathIndex> Lighthouse path to node index of the parsed HTML
+        source_map <SourceMap> Places of the parsed HTML elements in the raw HTML
     """
 
-    def __init__(self, *, target_url):
+    def __init__(self, *, target_url, browser_pool=None, admission=None):
         self._target_url = target_url
+        self._browser_pool = browser_pool or get_browser_pool()
+        self._admission = admission or get_admission_controller()
         self._raw_html = None
         self._bs_html = None
+        self._path_index = None
+        self._source_map = None
 
     async def crawl(self, force=False):
         """
@@ -39,20 +53,50 @@ class Crawler:
             force <bool> Whether to force a recrawl or not. Defaults to False.
         """
         if self._raw_html is None or self._bs_html is None or force:
-            browser = await launch(
-                handleSIGINT=False, handleSIGTERM=False, handleSIGHUP=False
-            )
-            page = await browser.newPage()
+            async with self._admission.slot(BROWSER), self._browser_pool.page() as page:
+                await self._load(page)
+
+    @asynccontextmanager
+    async def session(self):
+        """
+        Crawls the site and keeps the page that loaded it open until exit so that
+        other tools can connect to it and work on the page as it was crawled.
+
+        Yield:
+            <tuple>(<int>, <str>) Remote debugging port of the browser the site was
+                                  crawled in and id of the page it was loaded in
+        """
+        async with self._admission.slot(BROWSER), self._browser_pool.page() as page:
+            await self._load(page)
+            yield debugging_port(page.browser), target_id(page)
+
+    async def _load(self, page):
+        """
+        Navigates the page to the target site and keeps the raw and parsed HTML.
+
+        Parameters:
+            page <pyppeteer.page.Page> Page to load the site in
+        """
+        with timer("navigation"):
             await page.goto(self._target_url, timeout=0)
             content = await page.content()
+        self.load(content)
 
-            # Raw HTML should be treated as a file in case of transfer
-            self._raw_html = BytesIO()
-            self._raw_html.write(content.encode())  # Turn <str> into <bytes>
-            self._raw_html.seek(0)
+    def load(self, content):
+        """
+        Use HTML crawled before instead of crawling the site.
 
-            self._bs_html = BeautifulSoup(content, "html.parser")
-            await browser.close()
+        Parameters:
+            content <str> HTML of the site
+        """
+        # Raw HTML should be treated as a file in case of transfer
+        self._raw_html = BytesIO()
+        self._raw_html.write(content.encode())  # Turn <str> into <bytes>
+        self._raw_html.seek(0)
+
+        self._bs_html = make_soup(content)
+        self._path_index = None
+        self._source_map = None
 
     @property
     def raw_html(self):
@@ -63,3 +107,24 @@ class Crawler:
     def html_soup(self):
         """Get the BeautifulSoup parsed version of the HTML."""
         return self._bs_html
+
+    @property
+    def path_index(self):
+        """Get the index of the parsed HTML nodes by their Lighthouse path."""
+        if self._path_index is None and self._bs_html is not None:
+            self._path_index = PathIndex(self._bs_html)
+        return self._path_index
+
+    @property
+    def source_map(self):
+        """
+        Get the map of the parsed HTML elements to their place in the raw HTML, None
+        if the HTML wasn't parsed with html.parser, the only parser it can follow.
+        """
+        if (
+            self._source_map is None
+            and self._bs_html is not None
+            and self._bs_html.builder.NAME == "html.parser"
+        ):
+            self._source_map = SourceMap(self._raw_html.getvalue().decode())
+        return self._source_map
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+"""
+Index of a parsed page mapping Lighthouse node paths to the BeautifulSoup nodes they
+point to.
+
+Lighthouse describes the position of a node as the list of its indexes amongst its
+parent's children, skipping white-space only text nodes. Resolving such a path by
+walking down the tree means filtering the children of every level for every lookup,
+the index does this once for the whole document instead.
+"""
+
+
+from bs4.element import NavigableString, Tag
+
+
+class PathIndex:
+    """
+    Maps Lighthouse path tuples, as produced by the ResponseParser, to the nodes of a
+    BeautifulSoup document. The index is built in a single pass over the document and
+    is kept up to date when nodes are replaced through it.
+
+    Parameters:
+        soup <BeautifulSoup> Parsed HTML of the site
+    """
+
+    def __init__(self, soup):
+        self._nodes = {}
+        self._add_subtree(soup, ())
+
+    def get(self, path):
+        """
+        Get the node at the given path.
+
+        Parameters:
+            path <tuple> int tuple of the path down the HTML to the node
+
+        Return:
+            <PageElement> The node at the path or None if there is no such node
+        """
+        return self._nodes.get(path)
+
+    def replace(self, path, node):
+        """
+        Replaces the node at the given path in the document and updates the index with
+        the paths of the new node and its children.
+
+        Parameters:
+            path <tuple> int tuple of the path down the HTML to the node
+            node <PageElement> The node to put in place of the current one
+
+        Raise:
+            <KeyError> If there is no node at the given path
+        """
+        old_node = self._nodes[path]
+        self._remove_subtree(old_node, path)
+
+        old_node.replace_with(node)
+        self._add_subtree(node, path)
+
+    def __contains__(self, path):
+        return path in self._nodes
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def _add_subtree(self, root, prefix):
+        for node, path in self._walk(root, prefix):
+            self._nodes[path] = node
+
+    def _remove_subtree(self, root, prefix):
+        for _, path in self._walk(root, prefix):
+            self._nodes.pop(path, None)
+
+    @staticmethod
+    def _walk(root, prefix):
+        """
+        Iterates over the root and all of its descendants along with their path.
+
+        Parameters:
+            root <PageElement> Node at which to start the walk
+            prefix <tuple> Path of the root node
+
+        Yield:
+            <tuple>(<PageElement>, <tuple>) Pair of node and path
+        """
+        stack = [(root, prefix)]
+        while stack:
+            node, path = stack.pop()
+            yield node, path
+
+            if not isinstance(node, Tag):
+                continue
+
+            index = 0
+            for child in node.contents:
+                # Lighthouse does not count white-space only text nodes
+                if isinstance(child, NavigableString) and child.isspace():
+                    continue
+                stack.append((child, path + (index,)))
+                index += 1
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+"""
+Locates the elements of a parsed page in the HTML they were parsed from.
+
+Python's html.parser records where each tag starts in the source. Where an element
+ends is found by reading the source from its start, following the same rules as the
+parser when building the tree, until the element is closed. Only the elements that
+are looked up are read, so locating a few elements doesn't cost a pass over the page.
+"""
+
+
+from bisect import bisect_right
+from bs4.builder import HTMLTreeBuilder
+from html.parser import HTMLParser
+import re
+
+# Size of the pieces of source read at a time to find the end of an element
+READ_CHUNK_SIZE = 4096
+
+
+class SourceMap:
+    """
+    Maps the elements of a page parsed by html.parser to their span in its source.
+
+    Parameters:
+        source <str> HTML the page was parsed from
+        empty_element_tags <set> Names of the tags the parser never expects an end for
+    """
+
+    def __init__(
+        self, source, empty_element_tags=HTMLTreeBuilder.DEFAULT_EMPTY_ELEMENT_TAGS
+    ):
+        self._source = source
+        self._empty_element_tags = empty_element_tags
+        self._line_starts = [0] + [match.end() for match in re.finditer("\n", source)]
+
+    @property
+    def source(self):
+        return self._source
+
+    def span(self, node, ancestors):
+        """
+        Get the start and end offsets of an element in the source.
+
+        Parameters:
+            node <bs4.element.Tag> Element of the page, as parsed from the source
+            ancestors <list> Names of the tags the element is in, closest first
+
+        Return:
+            <tuple>(<int>, <int>) Offsets of the element in the source or None if the
+                                  parser didn't record where it starts
+        """
+        if getattr(node, "sourceline", None) is None:
+            return None
+
+        start = self._line_starts[node.sourceline - 1] + node.sourcepos
+        tag_start = self._source[start : start + len(node.name) + 2].lower()
+        if not re.match(rf"<{re.escape(node.name)}[\s/>]", tag_start):
+            return None
+
+        reader = _ElementReader(node.name, ancestors, self._empty_element_tags)
+        for chunk_start in range(start, len(self._source), READ_CHUNK_SIZE):
+            reader.feed(self._source[chunk_start : chunk_start + READ_CHUNK_SIZE])
+            if reader.end is not None:
+                line, column, length = reader.end
+                end = self._offset(start, line, column)
+                if length is None:
+                    # Up to and including the ">" of the end tag
+                    return start, self._source.index(">", end) + 1
+                return start, end + length
+
+        # Elements still open at the end of the source are closed by it
+        return start, len(self._source)
+
+    def _offset(self, start, line, column):
+        """Offset in the source of a line and column counted from the start offset."""
+        if line == 1:
+            return start + column
+        return (
+            self._line_starts[bisect_right(self._line_starts, start) + line - 2]
+            + column
+        )
+
+
+class _ElementReader(HTMLParser):
+    """
+    Reads the source from the start of an element until the element is closed, as
+    BeautifulSoup's html.parser tree builder would close it.
+
+    Properties:
+        end <tuple> Once found, line and column relative to the start of the element
+                    of the tag closing it, and the length of the element from there:
+                    0 when the tag belongs to a parent, None to end with the tag
+    """
+
+    def __init__(self, name, ancestors, empty_element_tags):
+        super().__init__(convert_charrefs=False)
+        self._ancestors = set(ancestors)
+        self._empty_element_tags = empty_element_tags
+        self._open = []
+        self.end = None
+
+    def feed(self, data):
+        if self.end is None:
+            try:
+                super().feed(data)
+            except _ElementEnd:
+                pass
+
+    def handle_starttag(self, tag, attrs):
+        if not self._open and tag in self._empty_element_tags:
+            # The element itself is an empty-element tag
+            self._stop(len(self.get_starttag_text()))
+        if not self._open or tag not in self._empty_element_tags:
+            self._open.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        # Empty-element tags are opened and closed right away
+        if not self._open:
+            self._stop(len(self.get_starttag_text()))
+
+    def handle_endtag(self, tag):
+        if tag in self._open:
+            while self._open.pop() != tag:
+                pass
+            if not self._open:
+                self._stop(None)
+        elif tag in self._ancestors:
+            # Closing a tag the element is in also closes the element
+            self._stop(0)
+
+    def _stop(self, length):
+        self.end = (*self.getpos(), length)
+        raise _ElementEnd()
+
+
+class _ElementEnd(Exception):
+    """Stops reading the source once the end of the element is found."""
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+from engine.crawler.source_map import READ_CHUNK_SIZE, SourceMap
+from engine.soup import make_soup
+import pytest
+
+PAGE = """<!DOCTYPE html>
+<html><head>
+<style>p > a { color: red } </p></style>
+<script>if (a < b && "</div>") { document.write("<p>") }</script>
+</head>
+<body><!-- <div>comment</div> -->
+<div id=x><p>one<p>two</div>
+<ul><li>a<li>b</ul>
+<p>Line<br>break<img src="a.png"/><input value='>'><hr></p>
+<svg><![CDATA[ </svg> ]]><rect/></svg>
+<table><tr><td>c<td>d</table>
+<P CLASS=up>Upper case</P>
+<div><span>unclosed</div>
+</body></html>"""
+
+
+def spans(source):
+    source_map = SourceMap(source)
+    soup = make_soup(source, "html.parser")
+    for node in soup.find_all(True):
+        span = source_map.span(node, [parent.name for parent in node.parents])
+        yield node, source[span[0] : span[1]]
+
+
+@pytest.mark.parametrize("source", [PAGE, PAGE.replace("\n", "\r\n")])
+def test_span_parses_to_element(source):
+    for node, html in spans(source):
+        assert str(make_soup(html, "html.parser").find()) == str(node)
+
+
+def test_span_void_elements():
+    found = {node.name: html for node, html in spans(PAGE)}
+
+    assert found["br"] == "<br>"
+    assert found["img"] == '<img src="a.png"/>'
+    assert found["input"] == "<input value='>'>"
+    assert found["hr"] == "<hr>"
+    assert found["rect"] == "<rect/>"
+
+
+def test_span_implicitly_closed():
+    found = [html for node, html in spans(PAGE) if node.name in ("p", "li", "td")]
+
+    assert found[:2] == ["<p>one<p>two", "<p>two"]
+    assert found[2:4] == ["<li>a<li>b", "<li>b"]
+    assert found[-3:-1] == ["<td>c<td>d", "<td>d"]
+
+
+def test_span_raw_text_and_comments():
+    found = {node.name: html for node, html in spans(PAGE)}
+
+    assert found["style"] == "<style>p > a { color: red } </p></style>"
+    assert found["script"].endswith('document.write("<p>") }</script>')
+    assert found["svg"] == "<svg><![CDATA[ </svg> ]]><rect/></svg>"
+    assert found["span"] == "<span>unclosed"
+
+
+def test_span_across_chunks():
+    text = "x" * (READ_CHUNK_SIZE * 2)
+    source = f"<html><body><div><p>{text}</p>\n<!-- </div> --></div></body></html>"
+
+    found = dict((node.name, html) for node, html in spans(source))
+
+    assert found["div"] == f"<div><p>{text}</p>\n<!-- </div> --></div>"
+
+
+def test_span_unclosed_element():
+    source = "<html><body><div><p>never closed"
+
+    found = dict((node.name, html) for node, html in spans(source))
+
+    assert found["div"] == "<div><p>never closed"
+
+
+def test_span_without_position():
+    source_map = SourceMap("<p>text</p>")
+    node = make_soup("<p>text</p>", "html.parser").p
+    node.sourceline = None
+
+    assert source_map.span(node, ["[document]"]) is None
@@ -12,13 +12,26 @@ target site.
 """
 
 
-from . import constants
+from . import auditor, constants
+from .cache import hash_content, make_key, normalize_url
 from .crawler import Crawler
 from .functions import caller as Caller
+from .functions import parallel
+from .jobs import stage
 from .lighthouse import Lighthouse
+from .lighthouse import config as lighthouse_config
+from .metrics import timer
+from .singleflight import SingleFlight
+from .soup import tag_name
+from bs4.element import Tag
+from contextvars import copy_context
 from io import BytesIO
+from soupsieve import SelectorSyntaxError
 import asyncio
 
+# Crawls, audits and fixes of the same site by concurrent Engines are only done once
+_in_flight = SingleFlight()
+
 
 class Engine:
     """
@@ -29,15 +42,75 @@ class Engine:
     Parameters:
         target_url <str> URL of the target website
         audit_format <str> Format in which lighthouse should return the audit
+        audit_config <str> Lighthouse configuration to audit with, one of
+                           lighthouse.AUDIT_CONFIGS
+        shared_session <bool> Audit the page the crawler loaded as it is, so that a
+                              single page load feeds both, needs Lighthouse 9
+        cache <Cache> Cache to reuse the audits and accessible sites of previous runs
+                      from, nothing is cached if None
+        artifacts <ArtifactStore> Store of the artifacts Lighthouse gathered from the
+                                  site, it is audited again from them rather than
+                                  loaded when they are there
+        on_stage <function> Called with the name and state of each stage of a run
+                            (analysis, crawl, fix) as it progresses
+        in_place <bool> Fix the nodes of the crawled page directly instead of parsing
+                        the Lighthouse snippets and putting them back in the page
+        parallel <bool> Spread the failing tags of large pages over a pool of
+                        processes, only used when in_place is False
+        contrast_stylesheet <bool> Fix the color contrast with classes of a single
+                                   generated stylesheet instead of inline styles
+        patch_source <bool> Build the accessible site by splicing the fixed elements
+                            into the crawled HTML, leaving the rest of it untouched,
+                            rather than serializing the whole page again
+        fast <bool> Skip Lighthouse and only fix the failing tags of the rules that
+                    can be found from the crawled HTML, constants.NATIVE_FUNCTIONS.
+                    The tags are fixed in place as they come from the crawled page.
+                    Only available for the json audit format
 
     Properties:
        audit <str> JSON of parsed lighthouse audit
+       score <float> Lighthouse accessibility score of the site
        site_html <BytesIO> Scraped HTML as a BytesIO object for transfers
+       html_soup <BeautifulSoup> Parsed HTML of the site, fixed once run_engine is done
+                                 unless the accessible site came from the cache or
+                                 from another Engine fixing the same site
+
+    Concurrent Engines for the same site and options share a single crawl, audit and
+    fix, the Engines that started last wait for the first one and load its results.
     """
 
-    def __init__(self, *, target_url, audit_format="json"):
+    def __init__(
+        self,
+        *,
+        target_url,
+        audit_format="json",
+        audit_config=lighthouse_config.ACCESSIBILITY,
+        shared_session=False,
+        cache=None,
+        artifacts=None,
+        on_stage=None,
+        in_place=False,
+        parallel=False,
+        contrast_stylesheet=False,
+        patch_source=True,
+        fast=False,
+    ):
+        if fast and audit_format != "json":
+            raise ValueError("The fast mode only produces json audits")
+
         self.target_url = target_url
         self._audit_format = audit_format
+        self._audit_config = audit_config
+        self._shared_session = shared_session
+        self._cache = cache
+        self.on_stage = on_stage
+        self._in_place = in_place
+        self._parallel = parallel
+        self._function_options = (
+            {"color-contrast": {"stylesheet": True}} if contrast_stylesheet else {}
+        )
+        self._patch_source = patch_source
+        self._fast = fast
 
         self._crawler = Crawler(target_url=self.target_url)
 
@@ -45,18 +118,28 @@ class Engine:
             function_names=constants.AWE_FUNCTIONS,
             target_url=target_url,
             audit_format=audit_format,
+            audit_config=audit_config,
+            artifacts=artifacts,
         )
 
         self._accessible_site = None
+        # (original, fixed) pairs of the elements of the page that were changed
+        self._changed_elements = []
 
     async def run_analysis(self, force=False):
         """
-        Runs a lighthouse analysis on the site.
+        Runs a lighthouse analysis on the site. In fast mode the crawled HTML is
+        audited instead, the site is crawled first if it wasn't yet.
 
         Parameters:
-            force <bool> Force a rerun of the analysis
+            force <bool> Force a rerun of the analysis, ignoring the cache
         """
-        await self._lighthouse.run(force)
+        with stage(self.on_stage, "analysis"):
+            if self._fast:
+                await self._crawl(force=False)
+                self._lighthouse.load(auditor.audit(self._crawler.html_soup))
+            elif force or not self._load_cached_audit():
+                await self._audit(force)
 
     @property
     def audit(self):
@@ -66,6 +149,11 @@ class Engine:
         else:
             return self._lighthouse.lighthouse_audit
 
+    @property
+    def score(self):
+        """Get the Lighthouse accessibility score of the site."""
+        return self._lighthouse.score
+
     async def run_crawler(self, force=False):
         """
         Crawls the site and scrapes the HTML.
@@ -73,19 +161,26 @@ class Engine:
         Parameters:
             force <bool> Force a rerun of the crawl
         """
-        await self._crawler.crawl(force)
+        with stage(self.on_stage, "crawl"):
+            await self._crawl(force)
 
     @property
     def site_html(self):
         """Get the scraped HTML as a BytesIO file-like format for transfers."""
         return self._crawler.raw_html
 
+    @property
+    def html_soup(self):
+        """Get the parsed HTML of the site."""
+        return self._crawler.html_soup
+
     async def run_engine(self):
         """
         Main Engine entry point.
         Crawls the target site to get it's HTML, runs the Lighthouse Audit on the site.
 
-        Sends each tag through it's pipeline.
+        Sends each tag through it's pipeline, the tags are grouped by function so that
+        each function is called once with all of its tags.
         Accessibility functions receive a dictionary with keys:
         ["colors", "selector", "snippet", "path"]
 
@@ -99,21 +194,275 @@ class Engine:
         Returns:
             <BytesIO> the accessible version of the site
         """
-        await asyncio.gather(self.run_analysis(), self.run_crawler())
+        if self._fast:
+            # The audit is made from the crawled HTML
+            await self.run_crawler()
+            await self.run_analysis()
+        elif self._shared_session:
+            await self._run_shared_session()
+        else:
+            await asyncio.gather(self.run_analysis(), self.run_crawler())
 
-        fixed_tags = (Caller.run_pipeline(tag) for tag in self._lighthouse.failing_tags)
-        self._reassemble_site(fixed_tags)
+        site_key = self._cache_key(
+            "site",
+            hash_content(self._crawler.raw_html.getvalue()),
+            self._in_place,
+            self._function_options,
+            self._patch_source,
+            self._fast,
+        )
+        with stage(self.on_stage, "fix"):
+            if self._cache is not None:
+                cached_site = self._cache.get(site_key)
+                if cached_site is not None:
+                    self._accessible_site = BytesIO(cached_site)
+                    return
 
-        # All offending tags will have now been replaced, save to bytes for transfer
-        byte_html = BytesIO()
-        byte_html.write(self._crawler.html_soup.encode())
-        byte_html.seek(0)
-        self._accessible_site = byte_html
+            site, shared = await _in_flight.do(site_key, self._fix_site)
+            self._accessible_site = BytesIO(site)
+
+        if self._cache is not None and not shared:
+            self._cache.set(site_key, site)
 
     @property
     def accessible_site(self):
         return self._accessible_site
 
+    async def _fix_site(self):
+        """
+        Fixes the failing tags of the crawled page.
+
+        Return:
+            <bytes> HTML of the accessible site
+        """
+        failing_tags, document_functions = self._split_document_functions(
+            self._lighthouse.failing_tags
+        )
+        self._changed_elements = []
+        fixed_tags = None
+        if self._parallel and not (self._in_place or self._fast):
+            fixed_tags = await parallel.run_parallel(
+                failing_tags,
+                self._crawler.html_soup,
+                function_options=self._function_options,
+            )
+
+        # The fixes are CPU bound, in a thread the event loop keeps serving other runs
+        return await asyncio.get_event_loop().run_in_executor(
+            None,
+            copy_context().run,
+            self._apply_fixes,
+            failing_tags,
+            fixed_tags,
+            document_functions,
+        )
+
+    def _apply_fixes(self, failing_tags, fixed_tags, document_functions):
+        """
+        Fixes the failing tags of the crawled page, or puts the tags already fixed
+        back in it, then runs the functions of the whole document.
+
+        Parameters:
+            failing_tags <list> Tags with their pipeline sorted by path length
+            fixed_tags <list> The same tags already fixed, None to fix them here
+            document_functions <list> Names of the functions of the whole document
+
+        Return:
+            <bytes> HTML of the accessible site
+        """
+        if self._in_place or self._fast:
+            self._fix_in_place(failing_tags)
+        else:
+            if fixed_tags is None:
+                fixed_tags = Caller.run_batches(
+                    failing_tags,
+                    self._crawler.html_soup,
+                    function_options=self._function_options,
+                )
+            self._reassemble_site(fixed_tags)
+
+        # Functions of the whole document go last as they can move tags around
+        if document_functions:
+            Caller.run_document_functions(document_functions, self._crawler.html_soup)
+
+        # All offending tags will have now been replaced, save to bytes for transfer
+        return self._serialize_site(bool(document_functions or self._function_options))
+
+    async def _run_shared_session(self):
+        """
+        Crawls the site then has Lighthouse take a snapshot of the page the crawl
+        loaded, without navigating, so the audited page is the one the crawler
+        captured instead of a second independent load.
+        """
+        if self._load_cached_audit():
+            await self.run_crawler()
+            return
+
+        with stage(self.on_stage, "crawl"), stage(self.on_stage, "analysis"):
+            (content, response), shared = await _in_flight.do(
+                self._cache_key("shared_session"), self._audit_shared_session
+            )
+            if shared:
+                self._crawler.load(content)
+                self._lighthouse.load(response)
+
+    async def _audit_shared_session(self):
+        """
+        Return:
+            <tuple>(<str>, <dict>) Crawled HTML and Lighthouse response
+        """
+        async with self._crawler.session() as session:
+            await self._lighthouse.run(session=session)
+        self._store_audit()
+        return self._crawler.raw_html.getvalue().decode(), self._lighthouse.response
+
+    async def _crawl(self, force):
+        """
+        Crawls the site, or waits for another Engine crawling it and takes its HTML.
+        Forced crawls only wait for other forced crawls.
+        """
+        if not force and self._crawler.raw_html is not None:
+            return
+
+        async def crawl():
+            await self._crawler.crawl(force)
+            return self._crawler.raw_html.getvalue().decode()
+
+        content, shared = await _in_flight.do(
+            make_key("crawl", normalize_url(self.target_url), force), crawl
+        )
+        if shared:
+            self._crawler.load(content)
+
+    async def _audit(self, force):
+        """
+        Runs Lighthouse on the site, or waits for another Engine auditing it the same
+        way and takes its response. Forced audits only wait for other forced audits.
+        """
+
+        async def audit():
+            await self._lighthouse.run(force)
+            self._store_audit()
+            return self._lighthouse.response
+
+        response, shared = await _in_flight.do(self._cache_key("audit", force), audit)
+        if shared:
+            self._lighthouse.load(response)
+
+    def _cache_key(self, *parts):
+        """Key of a cache entry for this site and audit configuration."""
+        return make_key(
+            normalize_url(self.target_url),
+            self._audit_config,
+            self._audit_format,
+            *parts,
+        )
+
+    def _load_cached_audit(self):
+        """
+        Load the Lighthouse response of a previous run from the cache.
+
+        Return:
+            <bool> Whether a cached response was found
+        """
+        if self._cache is None:
+            return False
+
+        response = self._cache.get(self._cache_key("audit"))
+        if response is None:
+            return False
+
+        self._lighthouse.load(response)
+        return True
+
+    def _store_audit(self):
+        if self._cache is not None:
+            self._cache.set(self._cache_key("audit"), self._lighthouse.response)
+
+    def _serialize_site(self, document_changed):
+        """
+        Get the accessible site as bytes. Unless something other than the failing tags
+        was changed, only the changed elements are serialized and spliced into the
+        crawled HTML, the rest of it is kept byte for byte.
+
+        Parameters:
+            document_changed <bool> Whether the page was changed outside of the tags
+
+        Return:
+            <bytes> HTML of the accessible site
+        """
+        with timer("serialization"):
+            if self._patch_source and not document_changed:
+                patched_html = self._patch_source_html()
+                if patched_html is not None:
+                    return patched_html
+            return self._crawler.html_soup.encode()
+
+    def _patch_source_html(self):
+        """
+        Splices the outermost changed elements into the crawled HTML.
+
+        Return:
+            <bytes> HTML of the accessible site or None if a changed element couldn't
+                    be found in the crawled HTML
+        """
+        source_map = self._crawler.source_map
+        if source_map is None:
+            return None
+
+        fixed_elements = {id(fixed) for _, fixed in self._changed_elements}
+        spans = {}
+        for original, fixed in self._changed_elements:
+            ancestors = list(fixed.parents)
+            # Elements inside another changed element are serialized with it
+            if any(id(ancestor) in fixed_elements for ancestor in ancestors):
+                continue
+
+            span = source_map.span(original, [ancestor.name for ancestor in ancestors])
+            if span is None:
+                return None
+            spans[span] = fixed
+
+        html = []
+        position = 0
+        for (start, end), fixed in sorted(spans.items(), key=lambda item: item[0]):
+            if start < position:
+                return None
+            html.append(source_map.source[position:start])
+            html.append(str(fixed))
+            position = end
+        html.append(source_map.source[position:])
+
+        return "".join(html).encode()
+
+    def _split_document_functions(self, failing_tags):
+        """
+        Takes the functions that fix the whole document out of the tag pipelines.
+
+        Parameters:
+            failing_tags <list> Tags with their pipeline sorted by path length
+
+        Return:
+            <tuple>(<list>, <list>) The tags that still have functions to go through,
+                                    and the names of the document functions to run
+        """
+        document_functions = set()
+        tags = []
+        for tag in failing_tags:
+            pipeline = []
+            for name in tag["pipeline"]:
+                if name in constants.DIRECT_FUNCTIONS:
+                    document_functions.add(name)
+                else:
+                    pipeline.append(name)
+            if pipeline:
+                tags.append({**tag, "pipeline": pipeline})
+
+        return (
+            tags,
+            [name for name in constants.DIRECT_FUNCTIONS if name in document_functions],
+        )
+
     def _reassemble_site(self, fixed_tags):
         """
         Recombines the site's HTML into a more accessible version by replacing
@@ -122,21 +471,70 @@ class Engine:
         Parameters:
             function_results <list> Collection of the function result objects
         """
-        for tag in fixed_tags:
-            self._find_and_replace_snippet(tag["snippet"], tag["path"])
+        with timer("reassembly"):
+            for tag in fixed_tags:
+                self._find_and_replace_snippet(tag["snippet"], tag["path"])
 
     def _find_and_replace_snippet(self, snippet, path):
         """
-        Navigates the HTML tree down to the tag and replaces it with the fixed snippet.
+        Looks up the tag in the path index of the HTML tree and replaces it with the
+        fixed snippet.
         """
-        curr_tag = self._crawler.html_soup
+        original = self._crawler.path_index.get(path)
         try:
-            for i in path:
-                # get tag contents(children), filter out white-space, reassign from index
-                curr_tag = [tag for tag in curr_tag.contents if not str(tag).isspace()][i]
-
-            curr_tag.replace_with(snippet)
-        except IndexError:
+            self._crawler.path_index.replace(path, snippet)
+            self._changed_elements.append((original, snippet))
+        except KeyError:
             # The crawler obtained a different site HTML than what Lighthouse did
             # causing a mismatch and thus an unreachable file
             pass
+
+    def _fix_in_place(self, failing_tags):
+        """
+        Runs each tag through its pipeline on the node of the crawled page it points
+        to. The snippets are neither parsed nor put back in the page, which also avoids
+        the snippets Lighthouse truncates for long elements.
+
+        Parameters:
+            failing_tags <list> Tags with their pipeline sorted by path length
+        """
+        tags = []
+        nodes = []
+        for tag in failing_tags:
+            node = self._find_node(tag)
+            if node is not None:
+                tags.append(tag)
+                nodes.append(node)
+
+        fixed_tags = Caller.run_batches(
+            tags, self._crawler.html_soup, nodes, self._function_options
+        )
+        with timer("reassembly"):
+            for tag, node, fixed in zip(tags, nodes, fixed_tags):
+                self._changed_elements.append((node, fixed["snippet"]))
+
+                # The function built a new tag rather than editing the one it was given
+                if fixed["snippet"] is not node:
+                    if self._crawler.path_index.get(tag["path"]) is node:
+                        self._crawler.path_index.replace(tag["path"], fixed["snippet"])
+                    else:
+                        node.replace_with(fixed["snippet"])
+
+    def _find_node(self, tag):
+        """
+        Get the node of the crawled page the failing tag points to. The path is tried
+        first and the selector is used when the path leads to a different element.
+
+        Return:
+            <bs4.element.Tag> The node or None if the page doesn't have it
+        """
+        name = tag_name(tag["snippet"])
+        node = self._crawler.path_index.get(tag["path"])
+        if isinstance(node, Tag) and node.name == name:
+            return node
+
+        try:
+            node = self._crawler.html_soup.select_one(tag["selector"])
+        except SelectorSyntaxError:
+            return None
+        return node if node is not None and node.name == name else None
@@ -1,4 +1,4 @@
-from bs4 import BeautifulSoup
+from engine.soup import make_tag
 from string import ascii_letters, digits as ascii_digits
 
 
@@ -15,7 +15,7 @@ def run(html):
     Return:
         <list> List of beautiful soup tags with proper accesskey attributes
     """
-    htmlTags = [BeautifulSoup(item["snippet"], "html.parser").find() for item in html]
+    htmlTags = [make_tag(item["snippet"]) for item in html]
     alphanum_keys = available_keys(htmlTags)
     htmlTags = add_keys(htmlTags, alphanum_keys)
     # We need to return a list of fixed items with the BeautifulSoup fixed tag
@@ -26,6 +26,26 @@ def run(html):
     return out
 
 
+def run_batch(tags, document):
+    """
+    Gives every failing tag of the page an accesskey that no other element of the page
+    uses. The first tag using a key keeps it, the following ones get a free key.
+
+    Parameters:
+        tags <list> Tag data of every failing element, snippets are BS4 tags
+        document <BeautifulSoup> Full HTML of the page
+    Return:
+        <list> The same tag data with unique accesskey attributes
+    """
+    htmlTags = [tag["snippet"] for tag in tags]
+    alphanum_keys = available_keys(htmlTags)
+    # Keys of the elements that are not failing are taken as well
+    for tag in document.find_all(accesskey=True):
+        alphanum_keys.difference_update(tag.get_attribute_list("accesskey"))
+    add_keys(htmlTags, alphanum_keys)
+    return tags
+
+
 def available_keys(htmlSnippets):
     """
     Clarifies which keys are available to assign to the HTML tags.
@@ -4,7 +4,9 @@
 Helper module to manage imports of awe function and their pipelined calls.
 """
 
-from bs4 import BeautifulSoup
+from engine.functions import visitor
+from engine.metrics import function_timer
+from engine.soup import make_tag
 
 from engine.functions.accesskeys import accesskeys as _accesskeys
 from engine.functions.audio_caption import audio_caption as _audio_caption
@@ -69,20 +71,148 @@ _functions_mapping = {
 }
 
 
-def run_pipeline(tag):
+def run_pipeline(tag, node=None):
     """
     Main method to run each tag through its pipeline.
 
     Parameters:
         tag <dict> Contains the HTML snippet along with a str list of its pipeline
+        node <bs4.element.Tag> Node of the page the tag points to, when given it is
+                               fixed in place instead of a parsed copy of the snippet
 
     Return:
-        <dict> The same tag but with the snippet fixed
+        <dict> Copy of the tag with the snippet fixed
     """
-    tag["snippet"] = BeautifulSoup(tag["snippet"], "html.parser").find()
+    tag = {**tag, "snippet": make_tag(tag["snippet"]) if node is None else node}
     return _compose_pipeline(tag["pipeline"])(tag)
 
 
+def run_document_functions(function_names, document):
+    """
+    Runs the functions that fix the whole document rather than a tag. The document is
+    walked once and each function gets the tags it listed in its VISIT_TAGS.
+
+    Parameters:
+        function_names <list> Names of the functions in the order to run them in
+        document <BeautifulSoup> Parsed HTML of the whole page
+
+    Return:
+        <BeautifulSoup> The fixed document
+    """
+    functions = [_functions_mapping[name] for name in function_names]
+    data = visitor.visit(
+        document, {name for function in functions for name in function.VISIT_TAGS}
+    )
+    for name, function in zip(function_names, functions):
+        with function_timer(name):
+            data = function.run(data)
+
+    return document
+
+
+def run_batches(tags, document, nodes=None, function_options=None):
+    """
+    Runs the tags through their pipelines one function at a time instead of one tag at
+    a time. Each function gets all of its tags in a single call to its run_batch, when
+    it has one, so that it can use what it knows of the whole page and share work
+    between tags. Functions without run_batch fall back to run for each tag.
+
+    Every tag still goes through its functions in the same order as with run_pipeline
+    and the tags of a function are given in the order they came in. A function named
+    twice in a pipeline only runs once on the tag, where it is first named.
+
+    Parameters:
+        tags <list> Tags with their pipeline sorted by path length
+        document <BeautifulSoup> Parsed HTML of the whole page
+        nodes <list> Nodes of the page to fix in place, in the same order as the tags,
+                     the snippets are parsed instead if None
+        function_options <dict> Keyword arguments given to the functions, by name
+
+    Return:
+        <list> The tags with their snippet fixed, in the same order
+    """
+    if nodes is None:
+        tags = [{**tag, "snippet": make_tag(tag["snippet"])} for tag in tags]
+    else:
+        tags = [{**tag, "snippet": node} for tag, node in zip(tags, nodes)]
+
+    pipelines = [_unique(tag["pipeline"]) for tag in tags]
+    batches = {}
+    for index, pipeline in enumerate(pipelines):
+        for name in pipeline:
+            batches.setdefault(name, []).append(index)
+
+    function_options = function_options or {}
+    for name in _batch_order(pipelines):
+        indexes = batches[name]
+        fixed_tags = _run_batch(
+            name, [tags[i] for i in indexes], document, function_options.get(name, {})
+        )
+        for index, tag in zip(indexes, fixed_tags):
+            tags[index] = tag
+
+    return tags
+
+
+def _run_batch(function_name, tags, document, options):
+    function = _functions_mapping[function_name]
+    with function_timer(function_name):
+        if hasattr(function, "run_batch"):
+            return function.run_batch(tags, document, **options)
+        return [function.run(tag, **options) for tag in tags]
+
+
+def _batch_order(pipelines):
+    """
+    Orders the functions of all the pipelines so that each one runs after the functions
+    that come after it in a pipeline, the same order as the composed pipeline.
+
+    Parameters:
+        pipelines <list> str lists of function names, each naming a function once
+
+    Return:
+        <list> Names of the functions in the order to run them in
+
+    Raise:
+        <ValueError> If two pipelines need their functions in opposite orders
+    """
+    after = {}
+    before_count = {}
+    for pipeline in pipelines:
+        for name in pipeline:
+            after.setdefault(name, set())
+            before_count.setdefault(name, 0)
+        # ['a', 'b', 'c'] -> a.run(b.run(c.run(x))), c runs first
+        for first, then in zip(pipeline[:0:-1], pipeline[-2::-1]):
+            if then not in after[first]:
+                after[first].add(then)
+                before_count[then] += 1
+
+    # Ties are broken by the order of the functions mapping so that runs are repeatable
+    rank = {name: i for i, name in enumerate(_functions_mapping)}
+    ready = sorted(
+        (name for name, count in before_count.items() if not count), key=rank.get
+    )
+    order = []
+    while ready:
+        name = ready.pop(0)
+        order.append(name)
+        for then in sorted(after[name], key=rank.get):
+            before_count[then] -= 1
+            if not before_count[then]:
+                ready.append(then)
+        ready.sort(key=rank.get)
+
+    if len(order) != len(after):
+        raise ValueError("The pipelines need their functions in conflicting orders")
+    return order
+
+
+def _unique(pipeline):
+    """Function names of the pipeline without repeats, in the same order."""
+    return list(dict.fromkeys(pipeline))
+
+
 def _compose_pipeline(function_names):
     """
     Changes the str list of function names into curried pipeline function
@@ -94,11 +224,12 @@ def _compose_pipeline(function_names):
     Return:
         <function> Curried pipelined function calls the snippet will go through
     """
-    function_list = tuple(_functions_mapping[name] for name in function_names)
+    function_list = tuple(function_names)
 
     def compose(acc, x, function_list):
-        if not function_list:
-            return acc.run(x)
-        return acc.run(compose(function_list[0], x, function_list[1:]))
+        if function_list:
+            x = compose(function_list[0], x, function_list[1:])
+        with function_timer(acc):
+            return _functions_mapping[acc].run(x)
 
     return lambda x: compose(function_list[0], x, function_list[1:])
@@ -2,17 +2,31 @@
 
 """
 The function first checks whether the text color is closer to white/black
-then lightens/darkens the text until the contrast is enough for AA WCAG.
+then lightens/darkens the text just enough for the contrast to pass AA WCAG.
 
 If changing the text color wasn't enough it will darken/lighen the
-background color until the contrast is enough for AA WCAG.
+background color just enough for the contrast to pass AA WCAG.
+
+Rather than stepping through the colors, the smallest change is found by bisection
+over the relative luminance of the colors, which only takes a few contrast checks, and
+every pair of colors is only solved once per process.
 """
 from bs4 import BeautifulSoup
-import wcag_contrast_ratio as contrast
+from engine.functions.style import format_style, parse_style
+from functools import lru_cache
 
 
 RGB_LIMIT = 255
-COLOR_STEP = 10
+AA_RATIO = 4.5
+
+# id of the <style> tag holding the rules of the stylesheet option
+STYLESHEET_ID = "awe-color-contrast"
+
+# Linear value of each sRGB channel value, used by the relative luminance
+_LINEAR = [
+    v / 12.92 if v <= 0.03928 else ((v + 0.055) / 1.055) ** 2.4
+    for v in (c / RGB_LIMIT for c in range(RGB_LIMIT + 1))
+]
 
 
 def run(tag_data):
@@ -26,94 +40,235 @@ def run(tag_data):
     Return:
         <list> List of beautiful soup tags with proper CSS contrast elements and their path
     """
-    back = hex_to_rgb(tag_data["colors"]["background"])
-    fore = hex_to_rgb(tag_data["colors"]["foreground"])  # Text color
-
-    # True if the background is closer to white than black
-    backLight = is_light(back)
-
-    # Set initial conditions for the foreground text color
-    cond = {
-        "contrast": not contrast.passes_AA(
-            contrast.rgb([v / RGB_LIMIT for v in back], [v / RGB_LIMIT for v in fore])
-        ),
-        "notLightest": max(fore) < RGB_LIMIT or backLight,
-        "notDarkest": all(fore) or not backLight,
-    }
-
-    # Loop to adjust the foreground colors
-    while all(cond.values()):
-        fore = [
-            color
-            + (
-                -min(COLOR_STEP, color)
-                if backLight
-                else min(COLOR_STEP, RGB_LIMIT - color)
-            )
-            for color in fore
-        ]
-
-        cond["contrast"] = not contrast.passes_AA(
-            contrast.rgb([v / RGB_LIMIT for v in back], [v / RGB_LIMIT for v in fore])
-        )
-        cond["notLightest"] = max(fore) < RGB_LIMIT or backLight
-        cond["notDarkest"] = all(fore) or not backLight
-
-    # Now we adjust the conditions to the background colors
-    cond["notLightest"] = max(back) < RGB_LIMIT or not backLight
-    cond["notDarkest"] = all(back) or backLight
-
-    # Loop to adjust the background colors
-    while all(cond.values()):
-        back = [
-            color
-            + (
-                min(COLOR_STEP, RGB_LIMIT - color)
-                if backLight
-                else -min(COLOR_STEP, color)
-            )
-            for color in back
-        ]
-
-        cond["contrast"] = not contrast.passes_AA(
-            contrast.rgb([v / RGB_LIMIT for v in back], [v / RGB_LIMIT for v in fore])
+    fore, back = solve(
+        tag_data["colors"]["foreground"], tag_data["colors"]["background"]
+    )
+    return apply(tag_data, fore, back)
+
+
+def run_batch(tags, document, stylesheet=False):
+    """
+    Fixes the contrast of every failing tag of the page, each distinct pair of colors
+    of the page is only solved once.
+
+    With the stylesheet option, the tags get a class instead of inline styles and each
+    distinct pair of new colors becomes a single rule of a <style> added to the head.
+
+    Parameters:
+        tags <list> Tag data of every failing element
+        document <BeautifulSoup> Full HTML of the page
+        stylesheet <bool> Set the colors through a shared stylesheet
+    Return:
+        <list> The same tag data with proper CSS contrast elements
+    """
+    pairs = [
+        (tag_data["colors"]["foreground"], tag_data["colors"]["background"])
+        for tag_data in tags
+    ]
+    solved = solve_distinct(pairs)
+    rules = {}
+    for tag_data, pair in zip(tags, pairs):
+        fore, back = solved[pair]
+        class_name = None
+        if stylesheet:
+            changed_back = back if rgb_to_hex(back) != pair[1].lower() else None
+            class_name, rules[class_name] = contrast_rule(fore, changed_back)
+        apply(tag_data, fore, back, class_name)
+
+    if rules:
+        add_stylesheet(document, rules)
+    return tags
+
+
+def solve_distinct(pairs, ratio=AA_RATIO):
+    """
+    Solves each distinct pair of the list once, one after the other.
+
+    Parameters:
+        pairs <list> Tuples of hexadecimal foreground and background colors
+        ratio <float> Contrast ratio the colors must reach
+    Return:
+        <dict> New foreground and background RGB colors of each distinct pair
+    """
+    return {pair: solve(*pair, ratio) for pair in dict.fromkeys(pairs)}
+
+
+@lru_cache(maxsize=4096)
+def solve(foreground, background, ratio=AA_RATIO):
+    """
+    Finds the closest foreground, and if needed background, colors passing AA WCAG.
+
+    Parameters:
+        foreground <str> Hexadecimal text color
+        background <str> Hexadecimal background color
+        ratio <float> Contrast ratio the colors must reach
+    Return:
+        <tuple> RGB tuples of the new foreground and background colors
+    """
+    back = tuple(hex_to_rgb(background))
+    fore = tuple(hex_to_rgb(foreground))  # Text color
+
+    # Text gets darker on light backgrounds and lighter on dark ones
+    step = -1 if is_light(back) else 1
+
+    fore = closest_shift(fore, step, lambda color: contrast_ratio(color, back) >= ratio)
+    if contrast_ratio(fore, back) < ratio:
+        # The text is as dark or light as it gets, move the background the other way
+        back = closest_shift(
+            back, -step, lambda color: contrast_ratio(fore, color) >= ratio
         )
-        cond["notLightest"] = max(back) < RGB_LIMIT or not backLight
-        cond["notDarkest"] = all(back) or backLight
 
-    snippet = tag_data["snippet"]
-    if not snippet.has_attr("style"):
-        snippet["style"] = ""
+    return fore, back
+
+
+def closest_shift(RGB, step, passes):
+    """
+    Finds the smallest shift of all the channels of the color that passes the check.
+    The luminance only grows, or shrinks, with the shift so it is found by bisection.
+
+    Parameters:
+        RGB <tuple> RGB color values
+        step <int> 1 to lighten the color, -1 to darken it
+        passes <function> Check of a color
+    Return:
+        <tuple> The shifted color, or white/black if no shift passes
+    """
+    if passes(RGB):
+        return RGB
+
+    low, high = 0, RGB_LIMIT
+    while high - low > 1:
+        middle = (low + high) // 2
+        if passes(shift(RGB, step * middle)):
+            high = middle
+        else:
+            low = middle
+    return shift(RGB, step * high)
 
-    backChanged = rgb_to_hex(back) != tag_data["colors"]["background"]
 
-    # Remove "background-color" styles if its color was changed
-    if backChanged and "background-color" in snippet["style"]:
-        start = snippet["style"].find("background-color")
-        end = snippet["style"].find(";", start) + 1
-        snippet["style"] = snippet["style"].replace(snippet["style"][start:end], "")
+def shift(RGB, amount):
+    """
+    Parameters:
+        RGB <tuple> RGB color values
+        amount <int> Value added to every channel
+    Return:
+        <tuple> The shifted color, channels are kept between 0 and RGB_LIMIT
+    """
+    return tuple(min(max(c + amount, 0), RGB_LIMIT) for c in RGB)
+
+
+def contrast_ratio(first, second):
+    """
+    Parameters:
+        first <tuple> RGB color values
+        second <tuple> RGB color values
+    Return:
+        <float> WCAG contrast ratio of the two colors
+    """
+    first = luminance(first)
+    second = luminance(second)
+    return (max(first, second) + 0.05) / (min(first, second) + 0.05)
+
+
+def luminance(RGB):
+    """
+    Parameters:
+        RGB <tuple> RGB color values
+    Return:
+        <float> WCAG relative luminance of the color
+    """
+    return (
+        0.2126 * _LINEAR[RGB[0]] + 0.7152 * _LINEAR[RGB[1]] + 0.0722 * _LINEAR[RGB[2]]
+    )
+
+
+def apply(tag_data, fore, back, class_name=None):
+    """
+    Sets the new colors in the style of the tag, or gives it the class of the
+    stylesheet rule setting them.
 
-    # Remove "background" styles if its color was changed
-    if backChanged and "background" in snippet["style"]:
-        start = snippet["style"].find("background")
-        end = snippet["style"].find(";", start) + 1
-        snippet["style"] = snippet["style"].replace(snippet["style"][start:end], "")
+    Parameters:
+        tag_data <dict> Tag data with the snippet as a BS4 tag and its old colors
+        fore <tuple> RGB values of the new text color
+        back <tuple> RGB values of the new background color
+        class_name <str> Class of the stylesheet rule with the new colors, the colors
+                         are set in the style attribute if None
+    Return:
+        <dict> The same tag data with proper CSS contrast elements
+    """
+    snippet = tag_data["snippet"]
+    backChanged = rgb_to_hex(back) != tag_data["colors"]["background"].lower()
+
+    # Remove the "color" styles, and the "background" ones if its color was changed
+    removed = ("color", "background", "background-color") if backChanged else ("color",)
+    declarations = [
+        (name, value)
+        for name, value in parse_style(snippet.get("style"))
+        if name not in removed
+    ]
 
-    # Remove "color" styles
-    if "color" in snippet["style"]:
-        start = snippet["style"].find("color")
-        end = snippet["style"].find(";", start) + 1
-        snippet["style"] = snippet["style"].replace(snippet["style"][start:end], "")
+    if class_name is None:
+        # Add the new calculated styles
+        declarations.append(("color", f"#{rgb_to_hex(fore)}"))
+        if backChanged:
+            declarations.append(("background", f"#{rgb_to_hex(back)}"))
+    else:
+        classes = snippet.get("class") or []
+        if isinstance(classes, str):
+            classes = classes.split()
+        if class_name not in classes:
+            snippet["class"] = classes + [class_name]
 
-    # Add the new calculated styles
-    snippet["style"] += f"color: #{rgb_to_hex(fore)}; "
-    snippet["style"] += f"background: #{rgb_to_hex(back)}; " if backChanged else ""
+    if declarations:
+        snippet["style"] = format_style(declarations)
+    elif snippet.has_attr("style"):
+        del snippet["style"]
 
     tag_data["snippet"] = snippet
 
     return tag_data
 
 
+def contrast_rule(fore, back=None):
+    """
+    Parameters:
+        fore <tuple> RGB values of the new text color
+        back <tuple> RGB values of the new background color, None if it wasn't changed
+    Return:
+        <tuple>(<str>, <str>) Class name and CSS rule setting the colors
+    """
+    name = f"awe-cc-{rgb_to_hex(fore)}"
+    declarations = [("color", f"#{rgb_to_hex(fore)} !important")]
+    if back is not None:
+        name += f"-{rgb_to_hex(back)}"
+        declarations.append(("background", f"#{rgb_to_hex(back)} !important"))
+
+    return name, f".{name} {{ {format_style(declarations)} }}"
+
+
+def add_stylesheet(document, rules):
+    """
+    Adds the rules to the stylesheet of the contrast fixes in the head of the page,
+    creating it if needed.
+
+    Parameters:
+        document <BeautifulSoup> Full HTML of the page
+        rules <dict> CSS rules by class name
+    """
+    style = document.find("style", id=STYLESHEET_ID)
+    if style is None:
+        head = document.head
+        if head is None:
+            head = document.new_tag("head")
+            (document.html or document).insert(0, head)
+        style = document.new_tag("style", id=STYLESHEET_ID)
+        head.append(style)
+
+    lines = (style.string or "").splitlines()
+    lines.extend(rules[name] for name in sorted(rules) if rules[name] not in lines)
+    style.string = "\n".join(lines)
+
+
 def hex_to_rgb(hexValue):
     """
     Parameters:
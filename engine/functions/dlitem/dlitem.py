@@ -1,29 +1,33 @@
-from bs4 import BeautifulSoup
+from engine.soup import make_tag
+
+VISIT_TAGS = ["dt", "dd"]
 
 def run(data):
     """
     Wraps <dd> and <dt> tags in <dl> tags.
 
     Parameters:
-    data <namedtuple> includes the full (html) and the (tag_data)
+    data <Document> includes the full (html) and its visited (tags)
     Return:
-    data <namedtuple> with the full fixed (html) 
+    data <Document> with the full fixed (html) 
     """
-    data.html = items(data.html)
+    items(data)
     return data
 
-def items(soup):
+def items(data):
     """
     Finds <dt> and <dd> tags, makes <dl> a sibling, then inserts tags in <dl> tag.
 
     Parameters:
-    Full HTML code <soup>
+    Full HTML code and its visited tags <Document>
     Return:
     Full HTML code with fixed tags <soup>
     """
-    tags = soup.find_all(['dt', 'dd'])
-    dltag = BeautifulSoup("<dl></dl>","html.parser").find()
+    tags = data.find_all('dt', 'dd')
+    if not tags:
+        return data.html
+    dltag = make_tag("<dl></dl>")
     (tags[0].parent).append(dltag)
     for tag in tags:
         dltag.append(tag)
-    return soup
\ No newline at end of file
+    return data.html
\ No newline at end of file
@@ -1,9 +1,10 @@
-from bs4 import BeautifulSoup
+from engine.soup import make_tag
 from rake_nltk import Rake
 import nltk
 import random
 
 TEXT_TAGS = ["p", "h1", "h2", "h3", "h4", "b", "i", "title", "a"]
+VISIT_TAGS = TEXT_TAGS
 
 def run(data):
     """
@@ -13,17 +14,17 @@ def run(data):
     from the text contained in the html.
 
     Parameters:
-        Full HTML code for webpage <string>
+        Full HTML code for webpage and its visited tags <Document>
     Return:
-        title tag <BeautifulSoup>
+        Same webpage with a title tag <Document>
     """
-    text = find_text(data.html)  # text extraction line (should be string or list of words)
+    text = find_text(data)  # text extraction line (should be string or list of words)
     wordCount = 0
     for item in text:
         wordCount += len(item.split())
     if wordCount >= 250:
         fix = title(text)  # the title in string format
-        tag = BeautifulSoup("<title>" + fix + "</title>", "html.parser")
+        tag = make_tag("<title>" + fix + "</title>")
         data.html.head.append(tag)
         return data  # returns modified html
     else:
@@ -79,18 +80,18 @@ def title(text):
         )  # constructs a string out of the most relevant keywords
         return title
 
-def find_text(bs):
+def find_text(data):
     """
-    Helper function that returns the text from a given BeautifulSoup object
+    Helper function that returns the text from the visited tags of a document
 
     Parameters:
-        bs <bs4> parent bs4 object
+        data <Document> visited document
     Return:
-        <string> 
+        <list> strings contained in tags
     """
     texts = []
     for tag in TEXT_TAGS:
-        for htmlTag in bs.find_all(tag):
+        for htmlTag in data.tags[tag]:
             texts.append(htmlTag.get_text())
             
     return texts
\ No newline at end of file
@@ -3,9 +3,9 @@ this function does NOT add a <span> tag to wrap the text that is in a different
 
 from bs4 import BeautifulSoup
 from langdetect import detect
-from collections import namedtuple
 
 TEXT_TAGS = ["p", "h1", "h2", "h3", "h4", "b", "i", "title", "a", "input"]
+VISIT_TAGS = TEXT_TAGS
 
 
 def run(data):
@@ -13,11 +13,11 @@ def run(data):
     Adds the missing and proper lang attribute on <html> tag.
 
     Parameters:
-        data <namedtuple> That has a bs4 object of the full (html) and a dictionary of (tag_data)
+        data <Document> That has a bs4 object of the full (html) and its visited (tags)
     Return:
-        data <namedtuple> With the fixed full HTML
+        data <Document> With the fixed full HTML
     """
-    lang = detect(find_text(data.html))
+    lang = detect(find_text(data))
     if (not data.html.find("html").has_attr("lang")) or data.html.find("html")[
         "lang"
     ] != lang:
@@ -25,24 +25,24 @@ def run(data):
     return data
 
 
-def find_text(bs):
+def find_text(data):
     """
-    Helper function that returns a maximum of 300 words from a given BeautifulSoup object
+    Helper function that returns a maximum of 300 words from the visited tags of a document
 
     Parameters:
-        bs <bs4> parent bs4 object
+        data <Document> visited document
     Return:
         <string> a maximum of 300 words
     """
     text = ""
     for tag in TEXT_TAGS:
         if tag == "input":
-            for htmlTag in bs.find_all(tag):
+            for htmlTag in data.tags[tag]:
                 text += (
                     htmlTag["placeholder"] if htmlTag.has_attr("placeholder") else ""
                 )
         else:
-            for htmlTag in bs.find_all(tag):
+            for htmlTag in data.tags[tag]:
                 text += htmlTag.get_text() + " "
                 if len(text.split()) >= 300:
                     return text
@@ -7,19 +7,21 @@ Info: https://dequeuniversity.com/rules/axe/3.2/meta-refresh
 Procedure taken from: https://www.w3.org/TR/2016/NOTE-WCAG20-TECHS-20161007/F41
 """
 
+VISIT_TAGS = ["meta"]
 
-def run(html):
+
+def run(data):
     """
     Parameters:
-        html <class bs4.BeautifulSoup> The full HTML of the target site
+        data <Document> The full HTML of the target site and its visited tags
 
     Return:
-        <class bs4.BeautifulSoup> Same site without refresh meta tags
+        <Document> Same site without refresh meta tags
     """
     # find all meta tags
-    for meta in html.find_all("meta"):
+    for meta in data.tags["meta"]:
         # if present, remove the http-equiv="refresh" attribute
         if meta.get("http-equiv") and meta["http-equiv"].lower() == "refresh":
             meta.decompose()
 
-    return html
+    return data
@@ -1,7 +1,7 @@
 def run(tag_data):
     """
     Ensures that the user-scalable="no" parameter is not present in the
-    <meta name="viewport"> element and the maximum-scale parameter is not less than 2.
+    <meta name="viewport"> element and the maximum-scale parameter is not less than 5.
 
     Parameters:
         tag_data <dict> Data of the faulty tag
@@ -13,13 +13,13 @@ def run(tag_data):
     # Remove "user-scalable=no if exists in the "content" attribute
     if "user-scalable=no" in snippet["content"]:
         snippet["content"] = snippet["content"].replace("user-scalable=no", "")
-    # Sets "maximum-scale" to be at least = 2
+    # Sets "maximum-scale" to be at least = 5
     if "maximum-scale" not in snippet["content"]:
-        snippet["content"] = snippet["content"] + ",maximum-scale=2"
+        snippet["content"] = snippet["content"] + ",maximum-scale=5"
     scaleIndexStart = snippet["content"].find("maximum-scale") + 14
     scaleIndexEnd = scaleIndexStart + num_length(snippet["content"][scaleIndexStart:])
     scale = float(snippet["content"][scaleIndexStart:scaleIndexEnd])
-    scale = 2 if scale < 2 else scale
+    scale = 5 if scale < 5 else scale
     snippet["content"] = snippet["content"].replace(
         snippet["content"][scaleIndexStart:scaleIndexEnd], str(scale)
     )
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+
+"""
+Runs the accessibility functions of large pages in a pool of processes.
+
+The failing tags are split into groups that don't overlap, a tag and the failing tags
+under it always stay together, and the groups are spread over the processes of the
+pool. Fixed snippets come back as HTML and are put back in the order of the tags so the
+result doesn't depend on which process finished first. The event loop only waits on
+the pool and is free to serve other requests in the meantime.
+"""
+
+
+from engine import constants
+from engine.functions import caller as Caller
+from engine.soup import make_tag
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextvars import copy_context
+import asyncio
+import os
+
+# Below this many tags the pool costs more than it saves
+MIN_PARALLEL_TAGS = 64
+
+_process_pool = None
+
+
+def get_process_pool():
+    """
+    Get the process pool shared by every Engine, created on first use with
+    AWE_FUNCTION_WORKERS processes, or one per core.
+
+    Return:
+        <ProcessPoolExecutor>
+    """
+    global _process_pool
+    if _process_pool is None:
+        workers = int(os.environ.get("AWE_FUNCTION_WORKERS") or os.cpu_count() or 1)
+        _process_pool = ProcessPoolExecutor(max_workers=workers)
+    return _process_pool
+
+
+def close_process_pool():
+    """Stop the processes of the shared pool, a new pool is created if needed again."""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown()
+        _process_pool = None
+
+
+def _discard_process_pool(executor):
+    global _process_pool
+    if executor is _process_pool:
+        _process_pool = None
+    executor.shutdown(wait=False)
+
+
+async def run_parallel(tags, document, executor=None, function_options=None):
+    """
+    Runs the tags through their pipelines, spreading them over the process pool.
+
+    Tags going through functions that need the whole page, or that are given options,
+    are fixed in this process along with the tags they overlap, in a thread so that the
+    event loop isn't blocked.
+
+    Parameters:
+        tags <list> Tags with their pipeline sorted by path length
+        document <BeautifulSoup> Parsed HTML of the whole page
+        executor <ProcessPoolExecutor> Pool to use instead of the shared one
+        function_options <dict> Keyword arguments given to the functions, by name
+
+    Return:
+        <list> The tags with their snippet fixed, in the same order
+    """
+    loop = asyncio.get_event_loop()
+    function_options = function_options or {}
+    if len(tags) < MIN_PARALLEL_TAGS:
+        # The context carries the timings of the request over to the thread
+        return await loop.run_in_executor(
+            None,
+            copy_context().run,
+            Caller.run_batches,
+            tags,
+            document,
+            None,
+            function_options,
+        )
+
+    executor = executor or get_process_pool()
+    local, shards = shard_tags(
+        tags, executor._max_workers, constants.PAGE_FUNCTIONS + list(function_options)
+    )
+
+    futures = [
+        loop.run_in_executor(executor, run_shard, [tags[i] for i in shard])
+        for shard in shards
+    ]
+    local_tags = await loop.run_in_executor(
+        None,
+        copy_context().run,
+        Caller.run_batches,
+        [tags[i] for i in local],
+        document,
+        None,
+        function_options,
+    )
+
+    try:
+        shard_snippets = await asyncio.gather(*futures)
+    except BrokenProcessPool:
+        # A broken pool stays broken, the next run gets a new one
+        _discard_process_pool(executor)
+        raise
+
+    fixed_tags = [None] * len(tags)
+    for index, tag in zip(local, local_tags):
+        fixed_tags[index] = tag
+    for shard, snippets in zip(shards, shard_snippets):
+        for index, snippet in zip(shard, snippets):
+            fixed_tags[index] = {**tags[index], "snippet": make_tag(snippet)}
+
+    return fixed_tags
+
+
+def run_shard(tags):
+    """
+    Fixes a group of tags in a process of the pool.
+
+    Parameters:
+        tags <list> Tags with their pipeline, the snippets as HTML
+
+    Return:
+        <list> HTML of the fixed snippets, in the same order
+    """
+    return [str(tag["snippet"]) for tag in Caller.run_batches(tags, None)]
+
+
+def shard_tags(tags, count, local_functions=constants.PAGE_FUNCTIONS):
+    """
+    Splits the tags into groups of tags that don't overlap, then spreads the groups
+    over the given number of shards, largest groups first.
+
+    Parameters:
+        tags <list> Tags with their pipeline sorted by path length
+        count <int> Number of shards
+        local_functions <list> Names of the functions whose tags stay in this process
+
+    Return:
+        <tuple>(<list>, <list>) Indexes of the tags to fix in this process, and a list
+                                of the indexes of the tags of every shard that isn't
+                                empty, indexes are in the order of the tags
+    """
+    groups = {}
+    roots = {}
+    for index, tag in enumerate(tags):
+        path = tag["path"]
+        root = next(
+            (roots[path[:i]] for i in range(1, len(path)) if path[:i] in roots), path
+        )
+        roots[path] = root
+        groups.setdefault(root, []).append(index)
+
+    local = []
+    shards = [[] for _ in range(max(count, 1))]
+    for group in sorted(groups.values(), key=len, reverse=True):
+        if any(
+            name in local_functions
+            for index in group
+            for name in tags[index]["pipeline"]
+        ):
+            local.extend(group)
+        else:
+            min(shards, key=len).extend(group)
+
+    return sorted(local), [sorted(shard) for shard in shards if shard]
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+"""
+Parser for the declarations of inline style attributes.
+
+Declarations are split on the semicolons that are outside of quotes and parentheses so
+that values such as url("a;b") are kept whole.
+"""
+
+
+def parse_style(style):
+    """
+    Parameters:
+        style <str> Value of a style attribute
+
+    Return:
+        <list> (<str>, <str>) pairs of lower case property name and value, in order
+    """
+    declarations = []
+    for declaration in _split(style or ""):
+        name, colon, value = declaration.partition(":")
+        name = name.strip().lower()
+        if colon and name:
+            declarations.append((name, value.strip()))
+    return declarations
+
+
+def format_style(declarations):
+    """
+    Parameters:
+        declarations <list> (<str>, <str>) pairs of property name and value
+
+    Return:
+        <str> Value of a style attribute
+    """
+    return "; ".join(f"{name}: {value}" for name, value in declarations) + ";"
+
+
+def _split(style):
+    """Yield the declarations of the style, split on the top level semicolons."""
+    start = 0
+    depth = 0
+    quote = None
+    escaped = False
+    for index, char in enumerate(style):
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif quote:
+            if char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth = max(depth - 1, 0)
+        elif char == ";" and not depth:
+            yield style[start:index]
+            start = index + 1
+    yield style[start:]
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+
+from engine.functions import caller
+from types import SimpleNamespace
+import pytest
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Replaces the functions with ones recording the tags they run on."""
+    calls = []
+
+    def function(name):
+        def run(tag_data):
+            calls.append((name, tag_data["snippet"]))
+            return tag_data
+
+        return SimpleNamespace(run=run)
+
+    monkeypatch.setattr(
+        caller, "_functions_mapping", {name: function(name) for name in "abcd"}
+    )
+    return calls
+
+
+def run_batches(pipelines):
+    tags = [{"pipeline": pipeline} for pipeline in pipelines]
+    return caller.run_batches(tags, None, nodes=list(range(len(tags))))
+
+
+def test_batch_order(calls):
+    run_batches([["a", "b"], ["b", "c"], ["d"]])
+
+    # Pipelines run from their last function to their first
+    assert calls == [("c", 1), ("b", 0), ("b", 1), ("a", 0), ("d", 2)]
+
+
+def test_batch_order_conflict(calls):
+    with pytest.raises(ValueError):
+        run_batches([["a", "b"], ["b", "a"]])
+    with pytest.raises(ValueError):
+        caller._batch_order([["a", "b"], ["b", "c"], ["c", "a"]])
+    assert calls == []
+
+
+def test_batch_order_function_named_twice(calls):
+    run_batches([["a", "b", "a"], ["a", "c"]])
+
+    # The repeated function only runs where it is first named
+    assert calls == [("b", 0), ("c", 1), ("a", 0), ("a", 1)]
+
+
+def test_unique():
+    assert caller._unique(["b", "a", "b", "c", "a"]) == ["b", "a", "c"]
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+from engine.functions.color_contrast.color_contrast import (
+    AA_RATIO,
+    closest_shift,
+    contrast_ratio,
+    rgb_to_hex,
+    solve,
+    solve_distinct,
+)
+import random
+import wcag_contrast_ratio
+
+
+def wcag_ratio(first, second):
+    return wcag_contrast_ratio.rgb([c / 255 for c in first], [c / 255 for c in second])
+
+
+def random_colors(count, seed=2020):
+    generator = random.Random(seed)
+    return [
+        (
+            rgb_to_hex([generator.randrange(256) for _ in range(3)]),
+            rgb_to_hex([generator.randrange(256) for _ in range(3)]),
+        )
+        for _ in range(count)
+    ]
+
+
+def test_solve_reaches_aa():
+    for foreground, background in random_colors(3000):
+        fore, back = solve(foreground, background)
+
+        assert wcag_contrast_ratio.passes_AA(wcag_ratio(fore, back))
+
+
+def test_solve_keeps_passing_colors():
+    assert solve("000000", "ffffff") == ((0, 0, 0), (255, 255, 255))
+
+
+def test_closest_shift_smallest_passing():
+    for foreground, background in random_colors(3000, seed=2021):
+        fore = tuple(int(foreground[i : i + 2], 16) for i in (0, 2, 4))
+        back = tuple(int(background[i : i + 2], 16) for i in (0, 2, 4))
+        step = -1 if sum(back) > sum(fore) else 1
+
+        def passes(color):
+            return contrast_ratio(color, back) >= AA_RATIO
+
+        shifted = closest_shift(fore, step, passes)
+        if not passes(shifted):
+            # Only when the text can't get any darker or lighter
+            assert shifted in ((0, 0, 0), (255, 255, 255))
+            continue
+        assert wcag_contrast_ratio.passes_AA(wcag_ratio(shifted, back))
+        if shifted != fore:
+            closer = tuple(min(max(c - step, 0), 255) for c in shifted)
+            assert not passes(closer)
+
+
+def test_solve_distinct():
+    pairs = [("777777", "888888"), ("777777", "888888"), ("ffffff", "eeeeee")]
+
+    solved = solve_distinct(pairs)
+
+    assert list(solved) == pairs[1:]
+    assert solved[pairs[0]] == solve(*pairs[0])
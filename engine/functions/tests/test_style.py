@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+
+from engine.functions.style import format_style, parse_style
+
+
+def test_parse_style():
+    assert parse_style(" Color : red;background:blue ;;") == [
+        ("color", "red"),
+        ("background", "blue"),
+    ]
+    assert parse_style(None) == []
+
+
+def test_parse_style_quoted_semicolon():
+    assert parse_style("font-family: 'a;b', \"c;d\"; color: red") == [
+        ("font-family", "'a;b', \"c;d\""),
+        ("color", "red"),
+    ]
+
+
+def test_parse_style_url():
+    style = "background: url(data:image/png;base64,AAAA) no-repeat; color: red"
+
+    assert parse_style(style) == [
+        ("background", "url(data:image/png;base64,AAAA) no-repeat"),
+        ("color", "red"),
+    ]
+    assert parse_style('background-image: url("a;b.png")') == [
+        ("background-image", 'url("a;b.png")')
+    ]
+
+
+def test_format_style_round_trip():
+    declarations = [("background", "url(a;b.png)"), ("color", "#000")]
+
+    assert parse_style(format_style(declarations)) == declarations
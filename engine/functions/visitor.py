@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+"""
+Single walk over the page for the functions that fix the whole document.
+
+Each of these functions lists the names of the tags it reads in its VISIT_TAGS, the
+document is walked once for all of them and every function gets the tags it asked for
+instead of searching the whole document on its own.
+"""
+
+
+from bs4.element import Tag
+
+
+class Document:
+    """
+    Tags of a document collected in a single walk.
+
+    Parameters:
+        html <BeautifulSoup> Parsed HTML of the whole page
+        tags <dict> Lists of the tags of the document by name, in document order
+        positions <dict> Position in the document of each collected tag, by id
+
+    Properties:
+        html <BeautifulSoup> Parsed HTML of the whole page
+        tags <dict> Lists of the tags of the document by name, in document order
+    """
+
+    def __init__(self, html, tags, positions):
+        self.html = html
+        self.tags = tags
+        self._positions = positions
+
+    def find_all(self, *names):
+        """
+        Get the tags of all the given names, as find_all would.
+
+        Parameters:
+            names <str> Names of the tags, they must have been visited
+
+        Return:
+            <list> The tags in document order
+        """
+        if len(names) == 1:
+            return list(self.tags[names[0]])
+        return sorted(
+            (tag for name in names for tag in self.tags[name]),
+            key=lambda tag: self._positions[id(tag)],
+        )
+
+
+def visit(html, tag_names):
+    """
+    Walks the document once and collects the tags of the given names.
+
+    Parameters:
+        html <BeautifulSoup> Parsed HTML of the whole page
+        tag_names <set> Names of the tags to collect
+
+    Return:
+        <Document> The collected tags
+    """
+    tags = {name: [] for name in tag_names}
+    positions = {}
+    for position, node in enumerate(html.descendants):
+        if isinstance(node, Tag) and node.name in tags:
+            tags[node.name].append(node)
+            positions[id(node)] = position
+
+    return Document(html, tags, positions)
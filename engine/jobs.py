@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+
+"""
+Background execution of Engine runs.
+
+Jobs run on an event loop living in its own thread so that the HTTP handlers only
+submit work and poll for it. A bounded number of jobs run at once, the others wait in
+the queue, and finished jobs are kept for a while so their result can be fetched.
+"""
+
+
+from contextlib import contextmanager
+import asyncio
+import threading
+import time
+import uuid
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Stages each kind of job goes through, in order
+JOB_STAGES = {
+    "analyze": ("analysis",),
+    "crawl": ("crawl",),
+    "run_engine": ("analysis", "crawl", "fix"),
+    "site": ("site",),
+}
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while the queue is full."""
+
+
+class Job:
+    """
+    State of a submitted Engine run.
+
+    Parameters:
+        kind <str> One of JOB_STAGES, the Engine method the job runs
+        engine <Engine> Engine the job runs, a SiteCrawler for site jobs, let go of
+                        once the job is finished
+
+    Properties:
+        id <str> Unique identifier of the job
+        target_url <str> URL of the site the job runs on
+        state <str> One of queued, running, done or failed
+        stages <dict> State of every stage of the job
+        result Output of the job once done
+        error <str> Reason the job failed
+    """
+
+    def __init__(self, *, kind, engine):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.engine = engine
+        self.target_url = engine.target_url
+        self.state = QUEUED
+        self.stages = {stage: QUEUED for stage in JOB_STAGES[kind]}
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+
+    def on_stage(self, stage, state):
+        """Progress callback given to the Engine."""
+        if stage in self.stages:
+            self.stages[stage] = state
+
+    @property
+    def finished(self):
+        return self.state in (DONE, FAILED)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "url": self.target_url,
+            "state": self.state,
+            "stages": dict(self.stages),
+            "error": self.error,
+            "submitted_at": self.submitted_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    Runs Engine jobs on a background event loop with at most `workers` jobs running
+    at the same time.
+
+    Parameters:
+        workers <int> Number of jobs running at the same time
+        max_pending <int> Number of unfinished jobs after which submissions are refused
+        retention <int> Seconds a finished job is kept
+        max_finished <int> Number of finished jobs kept, the oldest are forgotten first
+
+    Properties:
+        loop <asyncio.AbstractEventLoop> Event loop the jobs run on
+    """
+
+    def __init__(
+        self, *, workers=4, max_pending=100, retention=3600, max_finished=1000
+    ):
+        self._max_pending = max_pending
+        self._retention = retention
+        self._max_finished = max_finished
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+        self._workers = workers
+        self._semaphore = None
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="awe-jobs", daemon=True
+        )
+
+    @property
+    def loop(self):
+        return self._loop
+
+    def start(self):
+        """Start the background event loop."""
+        if not self._thread.is_alive():
+            self._thread.start()
+
+    def shutdown(self):
+        """Stop the background event loop once the current callbacks are done."""
+        if self._thread.is_alive():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+
+    def run(self, coro, limited=True):
+        """
+        Run a coroutine on the background loop and wait for its result, for callers
+        that need the result right away.
+
+        Parameters:
+            coro <coroutine> Coroutine to run
+            limited <bool> Whether the coroutine waits for a free worker like the jobs
+                           do, False for the coroutines that don't run an Engine
+
+        Return:
+            The coroutine's result
+        """
+        if limited:
+            coro = self._limited(coro)
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def submit(self, kind, engine):
+        """
+        Queue a job running the given Engine.
+
+        Parameters:
+            kind <str> One of JOB_STAGES
+            engine <Engine> Engine to run, or SiteCrawler for site jobs, it must not
+                            have a progress callback yet
+
+        Return:
+            <Job> The queued job
+
+        Raise:
+            <QueueFull> If there are already max_pending unfinished jobs
+        """
+        if kind not in JOB_STAGES:
+            raise ValueError(f"Unknown job kind {kind}")
+
+        with self._lock:
+            self._purge()
+            pending = sum(not job.finished for job in self._jobs.values())
+            if pending >= self._max_pending:
+                raise QueueFull(f"{pending} jobs are already waiting")
+
+            job = Job(kind=kind, engine=engine)
+            self._jobs[job.id] = job
+
+        engine.on_stage = job.on_stage
+        asyncio.run_coroutine_threadsafe(self._run_job(job), self._loop)
+        return job
+
+    def get(self, job_id):
+        """
+        Parameters:
+            job_id <str> Identifier of the job
+
+        Return:
+            <Job> The job or None if it is unknown or expired
+        """
+        with self._lock:
+            self._purge()
+            return self._jobs.get(job_id)
+
+    def __len__(self):
+        return len(self._jobs)
+
+    async def _run_job(self, job):
+        async with self._get_semaphore():
+            job.state = RUNNING
+            try:
+                job.result = await self._run_engine(job.kind, job.engine)
+                job.state = DONE
+            except Exception as e:
+                job.error = f"{type(e).__name__}: {e}"
+                job.state = FAILED
+            finally:
+                job.finished_at = time.time()
+                # Finished jobs are kept for their result, not for the parsed page
+                job.engine.on_stage = None
+                job.engine = None
+
+    async def _limited(self, coro):
+        async with self._get_semaphore():
+            return await coro
+
+    def _get_semaphore(self):
+        # Created on first use so that it belongs to the background loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._workers)
+        return self._semaphore
+
+    async def _run_engine(self, kind, engine):
+        """Run the Engine method of the job and return the output to keep."""
+        if kind == "analyze":
+            await engine.run_analysis()
+            audit = engine.audit
+            # Audits in other formats than json are file-like objects
+            return audit if isinstance(audit, str) else audit.getvalue()
+        if kind == "crawl":
+            await engine.run_crawler()
+            return engine.site_html.getvalue()
+        if kind == "site":
+            return await engine.run()
+
+        await engine.run_engine()
+        return engine.accessible_site.getvalue()
+
+    def _purge(self):
+        """
+        Forget the jobs that finished longer than the retention time ago, and the
+        oldest finished jobs past max_finished.
+        """
+        expired = time.time() - self._retention
+        finished = sorted(
+            (job for job in self._jobs.values() if job.finished),
+            key=lambda job: job.finished_at,
+        )
+        excess = len(finished) - self._max_finished
+        for index, job in enumerate(finished):
+            if index < excess or job.finished_at < expired:
+                del self._jobs[job.id]
+
+
+@contextmanager
+def stage(on_stage, name):
+    """
+    Report the progress of an Engine stage to a progress callback.
+
+    Parameters:
+        on_stage <function> Callback receiving the stage name and state, may be None
+        name <str> Name of the stage
+    """
+    if on_stage is None:
+        yield
+        return
+
+    on_stage(name, RUNNING)
+    try:
+        yield
+    except Exception:
+        on_stage(name, FAILED)
+        raise
+    on_stage(name, DONE)
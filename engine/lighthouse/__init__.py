@@ -1,3 +1,21 @@
 from engine.lighthouse.lighthouse import Lighthouse
+from engine.lighthouse.artifacts import ArtifactStore
+from engine.lighthouse.config import AUDIT_CONFIGS
+from engine.lighthouse.failing_tag import FailingTag
+from engine.lighthouse.worker_pool import (
+    LighthouseWorkerPool,
+    WorkerError,
+    close_worker_pool,
+    get_worker_pool,
+)
 
-__all__ = ["Lighthouse"]
+__all__ = [
+    "AUDIT_CONFIGS",
+    "ArtifactStore",
+    "FailingTag",
+    "Lighthouse",
+    "LighthouseWorkerPool",
+    "WorkerError",
+    "close_worker_pool",
+    "get_worker_pool",
+]
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+"""
+Store of the artifacts Lighthouse gathers from the pages it audits.
+
+Lighthouse first gathers what it needs from the loaded page, the artifacts, then runs
+its audits on them. Once saved, the artifacts can be audited again without loading
+the page, with other audits or for other functions, in a fraction of the time.
+"""
+
+
+from ..cache import make_key, normalize_url
+from contextlib import contextmanager
+from pathlib import Path
+import shutil
+import tempfile
+import time
+import uuid
+
+# File Lighthouse saves the artifacts in, other files hold the logs of the page load
+ARTIFACTS_FILE = "artifacts.json"
+
+
+class ArtifactStore:
+    """
+    Keeps the artifacts of every page in a folder of its own.
+
+    Parameters:
+        directory <Path> Directory the artifacts are kept in
+        ttl <int> Seconds the artifacts of a page are reused for, forever if None
+    """
+
+    def __init__(self, directory, ttl=None):
+        self._directory = Path(directory)
+        self._ttl = ttl
+
+    def path(self, url, config):
+        """
+        Get the folder of the artifacts of a page. Lighthouse only audits artifacts
+        with the settings they were gathered with, so each configuration has its own,
+        whatever audits are then run from them.
+
+        Parameters:
+            url <str> URL of the page
+            config <str> Name of the configuration file Lighthouse gathers with,
+                         which holds the digest of its settings, None for the
+                         default one
+
+        Return:
+            <Path> Folder of the artifacts, whether they were gathered or not
+        """
+        return self._directory / make_key(normalize_url(url), config)
+
+    def find(self, url, config):
+        """
+        Get the folder of the artifacts of a page if they can be audited again.
+
+        Return:
+            <Path> Folder of the artifacts or None if there are none or they expired
+        """
+        path = self.path(url, config)
+        try:
+            gathered_at = path.joinpath(ARTIFACTS_FILE).stat().st_mtime
+        except OSError:
+            return None
+
+        if self._expired(gathered_at):
+            return None
+        return path
+
+    @contextmanager
+    def gather(self, url, config):
+        """
+        Get a new folder for Lighthouse to save the artifacts of a page in. Once
+        Lighthouse is done they replace the artifacts of the page, so that audits
+        from the previous artifacts never see a partial folder. The expired
+        artifacts of every page are removed first.
+
+        Yield:
+            <Path> Folder to save the artifacts in
+        """
+        path = self.path(url, config)
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self._remove_expired()
+        staging = Path(tempfile.mkdtemp(prefix=f"{path.name}.", dir=self._directory))
+        try:
+            yield staging
+            if staging.joinpath(ARTIFACTS_FILE).exists():
+                self._replace(path, staging)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def clear(self):
+        """Remove the artifacts of every page."""
+        shutil.rmtree(self._directory, ignore_errors=True)
+
+    def _expired(self, gathered_at):
+        return self._ttl is not None and time.time() - gathered_at > self._ttl
+
+    def _remove_expired(self):
+        if self._ttl is None:
+            return
+
+        for path in self._directory.iterdir():
+            try:
+                # Folders left by an interrupted gather have no artifacts
+                gathered_at = path.joinpath(ARTIFACTS_FILE).stat().st_mtime
+            except OSError:
+                try:
+                    gathered_at = path.stat().st_mtime
+                except OSError:
+                    continue
+            if self._expired(gathered_at):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _replace(self, path, staging):
+        old = path.with_name(f"{path.name}.{uuid.uuid4().hex}.old")
+        try:
+            path.rename(old)
+        except FileNotFoundError:
+            pass
+
+        try:
+            staging.rename(path)
+        except OSError:
+            # Artifacts of the same page gathered at the same time took the place
+            pass
+        shutil.rmtree(old, ignore_errors=True)
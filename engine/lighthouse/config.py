@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+"""
+Generates the Lighthouse configurations AWE can audit a site with.
+
+The accessibility configuration only gathers what the accessibility audits handled by
+AWE need, skipping the performance trace, the screenshots and the other categories.
+"""
+
+
+from hashlib import sha1
+from pathlib import Path
+import json
+import os
+import tempfile
+
+# Only the accessibility audits AWE has functions for
+ACCESSIBILITY = "accessibility"
+# Every Lighthouse category, needed for the full report
+FULL = "full"
+
+AUDIT_CONFIGS = (ACCESSIBILITY, FULL)
+
+
+def build_config(function_names=None):
+    """
+    Build a Lighthouse configuration restricted to the accessibility category and to
+    the audits with the given names.
+
+    Parameters:
+        function_names <list> Names of the audits to run, same as the AWE functions,
+                              every accessibility audit if None
+
+    Return:
+        <dict> Lighthouse configuration
+    """
+    settings = {
+        "onlyCategories": ["accessibility"],
+        # Accessibility audits are not affected by network or CPU speed
+        "throttlingMethod": "provided",
+        "disableFullPageScreenshot": True,
+    }
+    if function_names is not None:
+        settings["onlyAudits"] = list(function_names)
+
+    return {
+        "extends": "lighthouse:default",
+        "settings": settings,
+        # The trace is only used by performance audits and holds the filmstrip
+        "passes": [{"passName": "defaultPass", "recordTrace": False}],
+    }
+
+
+def config_path(audit_config, function_names=None):
+    """
+    Get the path to the configuration file Lighthouse should be given, the file is
+    generated the first time a configuration is asked for.
+
+    Artifacts are gathered with the configuration of every audit, the audits run
+    from them can then be chosen freely since Lighthouse ignores onlyAudits when it
+    checks that artifacts are audited with the settings they were gathered with.
+
+    Parameters:
+        audit_config <str> One of AUDIT_CONFIGS
+        function_names <list> Names of the audits AWE handles, the configuration to
+                              gather artifacts with if None
+
+    Return:
+        <Path> Path to the JSON configuration or None for the default configuration
+    """
+    if audit_config == FULL:
+        return None
+    if audit_config != ACCESSIBILITY:
+        raise ValueError(f"Unknown audit config {audit_config}")
+
+    config = json.dumps(build_config(function_names), sort_keys=True)
+    digest = sha1(config.encode()).hexdigest()[:12]
+
+    path = Path(tempfile.gettempdir(), f"awe-lighthouse-{digest}.json")
+    if not path.exists():
+        # Write then rename so a concurrent audit never reads a partial file
+        partial = path.with_suffix(f".{os.getpid()}.tmp")
+        partial.write_text(config)
+        partial.replace(path)
+
+    return path
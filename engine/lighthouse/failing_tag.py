@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+"""
+Record of a tag failing one or more accessibility functions.
+
+Audits of large pages hold thousands of these so they are kept small: the fields are
+slotted, the function names are interned and shared by every tag failing the same
+function, and the colors are only extracted from the Lighthouse explanation when they
+are read.
+"""
+
+
+from collections.abc import Mapping
+
+
+class FailingTag(Mapping):
+    """
+    Immutable record of a failing tag. It reads like the tag data dict the accessibility
+    functions receive, {**failing_tag} or dict(failing_tag) give that dict.
+
+    Parameters:
+        snippet <str> HTML of the tag as reported by Lighthouse
+        selector <str> CSS selector of the tag
+        pipeline <tuple> Names of the functions the tag fails
+        path <tuple> int tuple of the path down the HTML to the tag
+        explanation <str> Lighthouse explanation holding the colors of the tag, None if
+                          it doesn't fail the color-contrast function
+
+    Properties:
+        colors <dict> Hex foreground and background colors of the text of the tag if it
+                      fails the color-contrast function, empty otherwise
+    """
+
+    __slots__ = ("snippet", "selector", "pipeline", "path", "_explanation", "_colors")
+
+    _KEYS = ("snippet", "selector", "colors", "pipeline", "path")
+
+    def __init__(self, snippet, selector, pipeline, path, explanation=None):
+        set_field = super().__setattr__
+        set_field("snippet", snippet)
+        set_field("selector", selector)
+        set_field("pipeline", pipeline)
+        set_field("path", path)
+        set_field("_explanation", explanation)
+        set_field("_colors", None)
+
+    @classmethod
+    def merge(cls, tags):
+        """
+        Merges the records of a tag failing several functions.
+
+        Parameters:
+            tags <list> FailingTag records of the same tag
+
+        Return:
+            <FailingTag> Record of the first with the functions of all of them in its
+                         pipeline, and the colors of the color-contrast one
+        """
+        first = tags[0]
+        explanation = None
+        for tag in tags:
+            if tag._explanation is not None:
+                explanation = tag._explanation
+        return cls(
+            first.snippet,
+            first.selector,
+            tuple(name for tag in tags for name in tag.pipeline),
+            first.path,
+            explanation,
+        )
+
+    @property
+    def colors(self):
+        if self._colors is None:
+            super().__setattr__("_colors", _extract_hex_codes(self._explanation))
+        return self._colors
+
+    def __reduce__(self):
+        # Pickled for the process pool, the default would set the slots one by one
+        return (
+            type(self),
+            (self.snippet, self.selector, self.pipeline, self.path, self._explanation),
+        )
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __getitem__(self, key):
+        if key not in self._KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self._KEYS)
+
+    def __len__(self):
+        return len(self._KEYS)
+
+    def __repr__(self):
+        return f"FailingTag({self.snippet!r}, pipeline={self.pipeline!r})"
+
+
+def _extract_hex_codes(explanation):
+    """
+    Extract the two hexadecimal codes in the explanation which represent the
+    foreground and the background colors.
+
+    Parameters:
+        explanation <str> Explanation of what is wrong and how to fix it
+
+    Return:
+        colors <dict> Hex foreground and background colors if it is the
+                      color-contrast explanation, empty object otherwise
+    """
+    fore = explanation.find("#") if explanation else -1
+    # Hash was not found means that this wasn't the 'color-contrast' function
+    if fore != -1:
+        fore = explanation[fore + 1 : fore + 7]
+        back = explanation.rfind("#")
+        back = explanation[back + 1 : back + 7]
+
+        return {"foreground": fore, "background": back}
+    else:
+        return {}
@@ -1,12 +1,16 @@
 #!/usr/bin/env python3
 
+from . import config
 from .parser import ResponseParser
+from .stream import ReportStreamParser
+from .worker_pool import get_worker_pool
+from ..metrics import timer
 from io import BytesIO
-import os
-import asyncio
 import json
 
-# import subprocess
+# Size of the chunks the JSON report is read and parsed in, the parser is much slower
+# on strings, such as screenshots, spread over many small chunks
+READ_CHUNK_SIZE = 256 * 1024
 
 """
 Wrapper class for Google Lighthouse and the response parsing module.
@@ -22,31 +26,75 @@ class Lighthouse:
         function_names <list> List of all the supported a11y functions
         target_url <str> URL of the target website
         audit_format <str> Format in which lighthouse should return the audit
+        audit_config <str> One of config.AUDIT_CONFIGS, defaults to the accessibility
+                           only configuration
+        artifacts <ArtifactStore> Store to save the gathered artifacts of the site in,
+                                  the site is audited again from them instead of
+                                  being loaded when they are there
 
 
     Properties:
         audit <str> Parsed JSON response mapping data to appropriate AWE function
         score <int> Score given to the site by Lighthouse
-        lighthouse_audit <BytesIO> File like object with full lighthouse audit
+        lighthouse_audit <BytesIO> File like object with the lighthouse audit, only the
+                                   parts AWE uses are kept for the json format
     """
 
-    def __init__(self, *, function_names, target_url, audit_format="json"):
+    def __init__(
+        self,
+        *,
+        function_names,
+        target_url,
+        audit_format="json",
+        audit_config=config.ACCESSIBILITY,
+        artifacts=None,
+    ):
         self._function_names = function_names
         self._target_url = target_url
         self._audit_format = audit_format
+        self._audit_config = audit_config
+        self._config_path = config.config_path(audit_config, function_names)
+        self._gather_config_path = config.config_path(audit_config)
+        self._artifacts = artifacts
         self._lighthouse_response = None
         self._parser = None
 
-    async def run(self, force=False):
-        """Run lighthouse on the target site and parse the JSON response."""
-        self._lighthouse_response = await self._run_lighthouse_audit()
+    async def run(self, force=False, session=None):
+        """
+        Run lighthouse on the target site and parse the JSON response.
+
+        Parameters:
+            force <bool> Force the parsing of the response to run again, and the site
+                         to be loaded again rather than audited from its artifacts
+            session <tuple>(<int>, <str>) Remote debugging port of a running Chrome and
+                                          id of the page loaded in it, the page is
+                                          audited as it is instead of loading the site
+        """
+        self._lighthouse_response = await self._run_lighthouse_audit(session, force)
         if self._audit_format == "json":
             self._run_parser(force)
 
+    def load(self, lighthouse_response):
+        """
+        Use a response from a previous run instead of running Lighthouse.
+
+        Parameters:
+            lighthouse_response Value of the response property of a previous run
+        """
+        self._lighthouse_response = lighthouse_response
+        if self._audit_format == "json":
+            self._run_parser(force=True)
+
+    @property
+    def response(self):
+        """Lighthouse response, pruned to what AWE uses for the json format."""
+        return self._lighthouse_response
+
     @property
     def audit(self):
         """Parsed JSON lighthouse audit."""
-        return json.dumps(self._parser.audit)
+        # The items of the audit are FailingTag records which read like dicts
+        return json.dumps(self._parser.audit, default=dict)
 
     @property
     def failing_tags(self):
@@ -62,32 +110,93 @@ class Lighthouse:
     def lighthouse_audit(self):
         """Returns lighthouse audit as a file-like object for transfers."""
         f = BytesIO()
-        f.write(self._lighthouse_response)
+        if self._audit_format == "json":
+            f.write(json.dumps(self._lighthouse_response).encode())
+        else:
+            f.write(self._lighthouse_response)
         f.seek(0)
         return f
 
-    async def _run_lighthouse_audit(self):
-        """Run lighthouse audit on the target site."""
-        command = f"""bash ./engine/lighthouse/run_lighthouse.sh \
-        {self._target_url} {self._audit_format} {os.environ.get("CHROME_PATH")}"""
-
-        proc = await asyncio.create_subprocess_shell(
-            command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
-        )
-
-        stdout, stderr = await proc.communicate()
-
-        if stderr:
-            error_msg = f"Lighthouse exited with {proc.returncode}\n{stderr.decode()}"
-            raise SystemError(error_msg)
-
-        # stdout is a byte string
-        return stdout
+    async def _run_lighthouse_audit(self, session=None, regather=False):
+        """
+        Run lighthouse audit on the target site, on one of the shared Lighthouse
+        workers. With an artifact store, the site is audited from its saved artifacts
+        if it has some, otherwise or if Lighthouse can't audit them, the artifacts
+        of every audit of the configuration are gathered from the site and saved.
+
+        Parameters:
+            session <tuple>(<int>, <str>) Chrome port and id of the page to audit as is
+            regather <bool> Load the site even if it has saved artifacts
+
+        JSON reports are parsed while the worker sends them, keeping only the parts
+        the ResponseParser needs, other formats are returned as is.
+
+        Return:
+            <dict> Pruned Lighthouse response for the json format, <bytes> otherwise
+        """
+        port, target = session or (None, None)
+        request = {
+            "url": self._target_url,
+            "output": self._audit_format,
+            "port": port,
+            "target": target,
+            "config": str(self._config_path) if self._config_path else None,
+        }
+        if self._audit_format == "json":
+            read_report = self._read_report
+        else:
+            read_report = self._read_all
+
+        if self._artifacts is None or session is not None:
+            # Pages audited as they are have nothing left to gather
+            return await get_worker_pool().audit(request, read_report)
+
+        # Artifacts are only audited with the settings they were gathered with, the
+        # audits run from them don't matter
+        gather_config = self._gather_config_path
+        config_name = gather_config.name if gather_config else None
+        artifacts = None
+        if not regather:
+            artifacts = self._artifacts.find(self._target_url, config_name)
+        if artifacts is not None:
+            try:
+                return await get_worker_pool().audit(
+                    {**request, "audit": str(artifacts)}, read_report
+                )
+            except SystemError:
+                # Artifacts Lighthouse can't audit, such as ones from another version
+                pass
+
+        with self._artifacts.gather(self._target_url, config_name) as artifacts:
+            request["gather"] = str(artifacts)
+            request["gather_config"] = str(gather_config) if gather_config else None
+            return await get_worker_pool().audit(request, read_report)
+
+    async def _read_all(self, stream):
+        return await stream.read()
+
+    async def _read_report(self, stream):
+        """
+        Parse the JSON report chunk by chunk as it is read from the stream.
+
+        Parameters:
+            stream Report sent by the Lighthouse worker, read with its read coroutine
+
+        Return:
+            <dict> Pruned Lighthouse response
+        """
+        report = ReportStreamParser(function_names=self._function_names)
+        with timer("report_parse"):
+            while True:
+                chunk = await stream.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    return report.close()
+                report.feed(chunk)
 
     def _run_parser(self, force):
-        if self._parser is None:
+        if self._parser is None or force:
             self._parser = ResponseParser(
-                lighthouse_response=json.loads(self._lighthouse_response),
+                lighthouse_response=self._lighthouse_response,
                 function_names=self._function_names,
             )
         self._parser.parse_audit_data(force)
@@ -7,18 +7,24 @@ with their function pipeline.
 """
 
 
+from .failing_tag import FailingTag
+from ..metrics import timer
+import sys
+
+
 class ResponseParser:
     """
     The Response Parser class is in charge of parsing the Lighthouse audit
     response into a more manageable format that all AWE functions can refer to.
 
     Parameters:
-        lighthouse_response <str> String response in JSON format
+        lighthouse_response <dict> Lighthouse response loaded from JSON
         function_names <list> List of all the supported a11y functions
 
     Properties:
         audit <dict> Parsed response mapping data to appropriate AWE function
-        failing_tags <list> Tags with a list of their failing functions sorted by path
+        failing_tags <tuple> FailingTag records with their failing functions sorted by
+                             path length
         score <int> Score given to the site by Lighthouse
     """
 
@@ -27,6 +33,7 @@ class ResponseParser:
         self._functions = function_names
         self._audit_data = None
         self._lh_score = None
+        self._failing_tags = None
 
     def parse_audit_data(self, force=False):
         """
@@ -39,10 +46,13 @@ class ResponseParser:
             force <bool> Default False. If True will parse lighthouse audit again.
         """
         if not self._audit_data or force:
-            self._lh_score = self._lh_response["categories"]["accessibility"]["score"]
-            self._audit_data = dict(
-                self._parse_lighthouse_response(self._lh_response, self._functions)
-            )
+            with timer("response_parser"):
+                categories = self._lh_response["categories"]
+                self._lh_score = categories["accessibility"]["score"]
+                self._audit_data = dict(
+                    self._parse_lighthouse_response(self._lh_response, self._functions)
+                )
+            self._failing_tags = None
 
     @property
     def audit(self):
@@ -50,13 +60,13 @@ class ResponseParser:
 
     @property
     def failing_tags(self):
-        """Get the list of failing tags with their pipeline sorted by path length."""
-        try:
-            return self._pipeline_function_data(
-                item for data in self._audit_data.values() for item in data["items"]
-            )
-        except AttributeError:
-            return None
+        """Get the failing tags with their pipeline sorted by path length."""
+        if self._failing_tags is None and self._audit_data is not None:
+            with timer("response_parser"):
+                self._failing_tags = self._pipeline_function_data(
+                    item for data in self._audit_data.values() for item in data["items"]
+                )
+        return self._failing_tags
 
     @property
     def score(self):
@@ -80,6 +90,8 @@ class ResponseParser:
         # name as the key
         for function_name, audit in lighthouse_response["audits"].items():
             if function_name in functions:
+                # Every tag of the function shares the same name string
+                function_name = sys.intern(function_name)
                 yield (
                     function_name,
                     {
@@ -106,18 +118,22 @@ class ResponseParser:
             function_name <str> Name of the function whos data is being parsed
 
         Yield:
-            <dict> Mapping of useful values from the filtered response
+            <FailingTag> Record of the useful values from the filtered response
         """
+        pipeline = (function_name,)
+        has_colors = function_name == "color-contrast"
         for item in items:
-            yield {
-                "snippet": item["node"]["snippet"],
-                "selector": item["node"]["selector"],
-                "colors": self._extract_hex_codes(item["node"]["explanation"]),
-                "pipeline": [function_name],
+            node = item["node"]
+            yield FailingTag(
+                node["snippet"],
+                node["selector"],
+                pipeline,
                 # path is in the format "1,HTML,1,BODY,0,DIV,..."
                 # we only need to keep the numbers (as integers)
-                "path": tuple(int(i) for i in item["node"]["path"].split(",")[::2]),
-            }
+                tuple(int(i) for i in node["path"].split(",")[::2]),
+                # colors are only extracted from the explanation once they are read
+                node["explanation"] if has_colors else None,
+            )
 
     def _pipeline_function_data(self, function_data_seq):
         """
@@ -126,46 +142,27 @@ class ResponseParser:
         length in order to replace parent tags before children tags.
 
         Parameters:
-            function_data_seq <generator> Sequence of function's audit data
+            function_data_seq <generator> Sequence of FailingTag of every function
 
         Return:
-            <list> list of function data unique by tags, sorted by path length
+            <tuple> FailingTag unique by tags, sorted by path length
         """
         result = {}
         for data in function_data_seq:
             try:
-                result[data["path"]]["pipeline"].extend(data["pipeline"])
+                result[data.path].append(data)
             except KeyError:
-                result[data["path"]] = data
-            finally:
-                # keep the "colors" value of the snippets that fail color-contrast
-                if data["pipeline"][0] == "color-contrast":
-                    result[data["path"]]["colors"] = data["colors"]
-
-        return sorted(result.values(), key=lambda value: len(value["path"]))
-
-    def _extract_hex_codes(self, explanation):
-        """
-        Extract the two hexadecimal codes in the explanation which represent the
-        foreground and the background colors.
-
-        Parameters:
-            explanation <str> Explanation of what is wrong and how to fix it
-
-        Return:
-            colors <dict> Hex foreground and background colors if it is the
-                          color-contrast explanation, empty object otherwise
-        """
-        fore = explanation.find("#")
-        # Hash was not found means that this wasn't the 'color-contrast' function
-        if fore != -1:
-            fore = explanation[fore + 1 : fore + 7]
-            back = explanation.rfind("#")
-            back = explanation[back + 1 : back + 7]
-
-            return {"foreground": fore, "background": back}
-        else:
-            return {}
+                result[data.path] = [data]
+
+        return tuple(
+            sorted(
+                (
+                    tags[0] if len(tags) == 1 else FailingTag.merge(tags)
+                    for tags in result.values()
+                ),
+                key=lambda tag: len(tag.path),
+            )
+        )
 
     def __len__(self):
         return len(self._audit_data)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+"""
+Incremental parser for the JSON Lighthouse report.
+
+The full report holds every category, the screenshots and the performance details and
+can weigh several megabytes. The parser reads it chunk by chunk as Lighthouse writes
+it, with the C backend of ijson, and only keeps the accessibility score and the
+audits of the AWE functions. Other audits are dropped as soon as they are read and the
+rest of the report is skipped over without being kept in memory.
+"""
+
+
+import ijson
+
+SCORE_PATH = ("categories", "accessibility", "score")
+
+
+class ReportStreamParser:
+    """
+    Reads a JSON Lighthouse report in chunks, keeping only the parts of it the
+    ResponseParser needs.
+
+    Parameters:
+        function_names <list> Names of the audits to keep
+
+    Properties:
+        response <dict> Lighthouse response with only the accessibility score and the
+                        kept audits, in the same layout as the full report
+    """
+
+    def __init__(self, *, function_names):
+        self._functions = set(function_names)
+        self._score = None
+        self._audits = {}
+
+        # Both parsers read every chunk, each builds only the values under its prefix
+        self._audit_items = ijson.sendable_list()
+        self._score_items = ijson.sendable_list()
+        self._parsers = (
+            ijson.kvitems_coro(self._audit_items, "audits", use_float=True),
+            ijson.items_coro(self._score_items, ".".join(SCORE_PATH), use_float=True),
+        )
+
+    def feed(self, chunk):
+        """
+        Parse the next chunk of the report.
+
+        Parameters:
+            chunk <bytes> Next bytes written by Lighthouse
+        """
+        try:
+            for parser in self._parsers:
+                parser.send(chunk)
+        except ijson.JSONError as error:
+            raise ValueError(f"Lighthouse report isn't valid JSON: {error}") from error
+        self._keep_items()
+
+    def close(self):
+        """
+        Finish parsing the report.
+
+        Return:
+            <dict> The pruned Lighthouse response
+
+        Raise:
+            <ValueError> If the report ended before being complete
+        """
+        try:
+            for parser in self._parsers:
+                parser.close()
+        except ijson.JSONError as error:
+            raise ValueError("Lighthouse report ended unexpectedly") from error
+        self._keep_items()
+        return self.response
+
+    @property
+    def response(self):
+        return {
+            "categories": {"accessibility": {"score": self._score}},
+            "audits": self._audits,
+        }
+
+    def _keep_items(self):
+        for name, audit in self._audit_items:
+            if name in self._functions:
+                self._audits[name] = audit
+        self._audit_items.clear()
+
+        if self._score_items:
+            self._score = self._score_items.pop()
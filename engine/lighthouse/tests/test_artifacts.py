@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+from engine.lighthouse import ArtifactStore, lighthouse
+from engine.lighthouse.artifacts import ARTIFACTS_FILE
+from pathlib import Path
+import asyncio
+import json
+
+
+class FakeWorkerPool:
+    """Saves the artifacts it is asked to gather and records every request."""
+
+    def __init__(self):
+        self.requests = []
+
+    async def audit(self, request, read_report):
+        self.requests.append(request)
+        if "gather" in request:
+            Path(request["gather"], ARTIFACTS_FILE).write_text("{}")
+        return b"<html></html>"
+
+
+def run_audit(function_names, store):
+    auditor = lighthouse.Lighthouse(
+        function_names=function_names,
+        target_url="https://example.com/",
+        audit_format="html",
+        artifacts=store,
+    )
+    return asyncio.run(auditor._run_lighthouse_audit())
+
+
+def only_audits(request):
+    return json.loads(Path(request["config"]).read_text())["settings"]["onlyAudits"]
+
+
+def test_artifacts_reused_when_functions_change(tmp_path, monkeypatch):
+    pool = FakeWorkerPool()
+    monkeypatch.setattr(lighthouse, "get_worker_pool", lambda: pool)
+    store = ArtifactStore(tmp_path, ttl=60)
+
+    run_audit(["image-alt", "link-name"], store)
+    run_audit(["image-alt"], store)
+
+    gather, audit = pool.requests
+    gather_config = Path(gather["gather_config"])
+    assert "onlyAudits" not in json.loads(gather_config.read_text())["settings"]
+    assert only_audits(gather) == ["image-alt", "link-name"]
+
+    assert "gather" not in audit
+    assert Path(audit["audit"]) == store.find(gather["url"], gather_config.name)
+    assert only_audits(audit) == ["image-alt"]
+
+
+def test_sessions_audited_without_artifacts(tmp_path, monkeypatch):
+    pool = FakeWorkerPool()
+    monkeypatch.setattr(lighthouse, "get_worker_pool", lambda: pool)
+    store = ArtifactStore(tmp_path, ttl=60)
+
+    run_audit(["image-alt"], store)
+    auditor = lighthouse.Lighthouse(
+        function_names=["image-alt"],
+        target_url="https://example.com/",
+        audit_format="html",
+        artifacts=store,
+    )
+    asyncio.run(auditor._run_lighthouse_audit(session=(9222, "page")))
+
+    session = pool.requests[-1]
+    assert (session["port"], session["target"]) == (9222, "page")
+    assert "gather" not in session and "audit" not in session
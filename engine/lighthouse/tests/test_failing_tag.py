@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+
+from engine.lighthouse.failing_tag import FailingTag
+import pickle
+
+
+def test_pickle_round_trip():
+    tag = FailingTag(
+        '<p style="color: #777777">',
+        "body > p",
+        ("color-contrast", "link-name"),
+        (1, 2, 0),
+        "Element has insufficient color contrast of 1.25 (foreground color: #777777, "
+        "background color: #888888, font size: 12.0pt, font weight: normal).",
+    )
+
+    copy = pickle.loads(pickle.dumps(tag))
+
+    assert isinstance(copy, FailingTag)
+    assert dict(copy) == dict(tag)
+    assert copy.colors == {"foreground": "777777", "background": "888888"}
+
+
+def test_pickle_without_explanation():
+    tag = FailingTag("<img>", "img", ("image-alt",), (1, 1))
+
+    copy = pickle.loads(pickle.dumps(tag))
+
+    assert dict(copy) == dict(tag)
+    assert copy.colors == {}
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+from engine import constants
+from engine.lighthouse.stream import ReportStreamParser
+from pathlib import Path
+import json
+import pytest
+
+AUDIT_FILE = Path(__file__).parent.parent.joinpath("audit.json")
+
+
+def expected_response(report, function_names):
+    return {
+        "categories": {
+            "accessibility": {"score": report["categories"]["accessibility"]["score"]}
+        },
+        "audits": {
+            name: audit
+            for name, audit in report["audits"].items()
+            if name in function_names
+        },
+    }
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096, 2 ** 20])
+def test_matches_json_loads(chunk_size):
+    content = AUDIT_FILE.read_bytes()
+    report = ReportStreamParser(function_names=constants.AWE_FUNCTIONS)
+
+    for start in range(0, len(content), chunk_size):
+        report.feed(content[start : start + chunk_size])
+
+    assert report.close() == expected_response(
+        json.loads(content), constants.AWE_FUNCTIONS
+    )
+
+
+def test_split_characters():
+    content = json.dumps(
+        {
+            "categories": {"accessibility": {"score": 0.5}},
+            "audits": {"image-alt": {"title": "Été ✓"}, "other": {}},
+        },
+        ensure_ascii=False,
+    ).encode()
+    report = ReportStreamParser(function_names=["image-alt"])
+
+    for start in range(len(content)):
+        report.feed(content[start : start + 1])
+
+    assert report.close() == expected_response(json.loads(content), ["image-alt"])
+
+
+def test_incomplete_report():
+    report = ReportStreamParser(function_names=constants.AWE_FUNCTIONS)
+    report.feed(AUDIT_FILE.read_bytes()[:1000])
+
+    with pytest.raises(ValueError):
+        report.close()
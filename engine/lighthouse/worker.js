@@ -0,0 +1,201 @@
+#!/usr/bin/env node
+
+/*
+ * Long-lived Lighthouse worker.
+ *
+ * Lighthouse and Chrome are loaded once and then audit one site after the other.
+ * Requests are read from stdin, one JSON object per line:
+ *
+ *   {"id": 1, "url": "...", "output": "json", "port": null, "target": null,
+ *    "config": null}
+ *
+ * port is the remote debugging port of an already running Chrome to audit in, the
+ * worker's own Chrome is used otherwise. With a target, the id of a page already
+ * loaded in that Chrome, a snapshot of the page is audited as it is without
+ * navigating, which needs Lighthouse 9. config is the path to a Lighthouse
+ * configuration file, the default configuration is used otherwise.
+ *
+ * With a "gather" folder, the artifacts gathered from the site with the "gather_config"
+ * configuration are saved there before being audited with "config". With an "audit"
+ * folder, the artifacts saved there are audited instead, the site isn't loaded and
+ * Chrome isn't needed.
+ *
+ * Every response is a header line followed by a body of the given number of bytes:
+ *
+ *   <id> ok <length>\n<report>
+ *   <id> error <length>\n<message>
+ *
+ * stdout only carries responses, anything logged goes to stderr.
+ *
+ * Settings and configurations are those of Lighthouse 7 to 9.
+ */
+
+const fs = require("fs");
+const path = require("path");
+const readline = require("readline");
+
+const CHROME_FLAGS = ["--headless", "--no-first-run"];
+
+// Globally installed modules, as with "npm install -g lighthouse"
+const GLOBAL_MODULES = path.join(path.dirname(process.execPath), "..", "lib", "node_modules");
+
+console.log = console.error;
+
+async function load(name) {
+    let resolved;
+    try {
+        resolved = require.resolve(name);
+    } catch (error) {
+        resolved = require.resolve(name, {
+            paths: [GLOBAL_MODULES, path.join(GLOBAL_MODULES, "lighthouse", "node_modules")],
+        });
+    }
+    try {
+        return require(resolved);
+    } catch (error) {
+        // Recent versions are only published as ES modules
+        return (await import(resolved)).default;
+    }
+}
+
+let lighthouse = null;
+let chromeLauncher = null;
+let chrome = null;
+const configs = new Map();
+
+async function chromePort() {
+    if (chrome === null) {
+        chrome = await chromeLauncher.launch({
+            chromePath: process.env.CHROME_PATH || undefined,
+            chromeFlags: CHROME_FLAGS,
+        });
+    }
+    return chrome.port;
+}
+
+function loadConfig(configPath) {
+    if (!configPath) {
+        return undefined;
+    }
+    if (!configs.has(configPath)) {
+        configs.set(configPath, JSON.parse(fs.readFileSync(configPath, "utf8")));
+    }
+    return configs.get(configPath);
+}
+
+async function audit(request) {
+    const flags = {
+        output: request.output,
+        // Audit the page as loaded, without emulating a device
+        formFactor: "desktop",
+        screenEmulation: { disabled: true },
+        logLevel: "error",
+    };
+    if (request.target) {
+        return snapshot(request, flags);
+    }
+    if (request.audit) {
+        flags.auditMode = request.audit;
+    } else {
+        if (request.port) {
+            flags.port = request.port;
+            flags.disableStorageReset = true;
+        } else {
+            flags.port = await chromePort();
+        }
+        if (request.gather) {
+            // Saved with the gathering configuration then audited from the same folder
+            await lighthouse(
+                request.url,
+                { ...flags, gatherMode: request.gather },
+                loadConfig(request.gather_config)
+            );
+            flags.auditMode = request.gather;
+        }
+    }
+
+    const result = await lighthouse(request.url, flags, loadConfig(request.config));
+    return reportOf(result, request.url);
+}
+
+async function snapshot(request, flags) {
+    const api = await load("lighthouse/lighthouse-core/fraggle-rock/api.js");
+    const puppeteer = await load("puppeteer-core");
+    const browser = await puppeteer.connect({
+        browserURL: `http://127.0.0.1:${request.port}`,
+        defaultViewport: null,
+    });
+    try {
+        const target = browser.targets().find((target) => target._targetId === request.target);
+        const page = target && (await target.page());
+        if (!page) {
+            throw new Error(`No page ${request.target} to audit ${request.url} in`);
+        }
+
+        // Passes only configure navigations, which snapshots don't make
+        const { passes, ...config } = loadConfig(request.config) || {};
+        const result = await api.snapshot({
+            page,
+            config: request.config ? config : undefined,
+            configContext: { settingsOverrides: flags },
+        });
+        return reportOf(result, request.url);
+    } finally {
+        // Leaves the browser and the page open for the crawler
+        browser.disconnect();
+    }
+}
+
+function reportOf(result, url) {
+    if (!result) {
+        throw new Error(`Lighthouse returned no result for ${url}`);
+    }
+    return Array.isArray(result.report) ? result.report[0] : result.report;
+}
+
+function respond(id, status, body) {
+    const data = Buffer.from(body);
+    return new Promise((resolve) => {
+        process.stdout.write(`${id} ${status} ${data.length}\n`);
+        process.stdout.write(data, resolve);
+    });
+}
+
+async function main() {
+    lighthouse = await load("lighthouse");
+    chromeLauncher = await load("chrome-launcher");
+
+    // Audits run one at a time, the next request is read once the last one is done
+    const lines = readline.createInterface({ input: process.stdin });
+    for await (const line of lines) {
+        if (!line.trim()) {
+            continue;
+        }
+
+        let request = { id: 0 };
+        try {
+            request = JSON.parse(line);
+            await respond(request.id, "ok", await audit(request));
+        } catch (error) {
+            await respond(request.id, "error", String((error && error.stack) || error));
+        }
+    }
+}
+
+function shutdown() {
+    if (chrome !== null) {
+        chrome.kill();
+        chrome = null;
+    }
+}
+
+process.on("exit", shutdown);
+process.on("SIGTERM", () => process.exit(0));
+
+main().then(
+    () => process.exit(0),
+    (error) => {
+        console.error(error);
+        process.exit(1);
+    }
+);
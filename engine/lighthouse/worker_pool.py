@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+
+"""
+Pool of long-lived Lighthouse workers shared by every Lighthouse of the process.
+
+Starting a shell, Node.js, the Lighthouse module and a fresh Chrome is most of the cost
+of an audit. A worker, worker.js, keeps all of them loaded and audits the sites it is
+sent over stdin one after the other, answering on stdout. The pool runs a few of them,
+queues the audits until a worker is free, and recycles the workers that fail or have
+audited enough sites.
+"""
+
+
+from ..admission import LIGHTHOUSE, get_admission_controller
+from ..metrics import timer
+from contextlib import asynccontextmanager
+from pathlib import Path
+import asyncio
+import json
+import os
+
+WORKER_SCRIPT = Path(__file__).with_name("worker.js")
+
+# Seconds an audit can take before its worker is considered stuck
+AUDIT_TIMEOUT = 300
+
+# Seconds a worker is given to exit, and close its Chrome, before being killed
+EXIT_TIMEOUT = 5
+
+
+class WorkerError(Exception):
+    """Raised when a worker stops answering, it is recycled."""
+
+
+class _Worker:
+    """Node.js process running worker.js, with the number of audits it has run."""
+
+    def __init__(self, process):
+        self.process = process
+        self.audits = 0
+        self._next_id = 0
+
+    @property
+    def alive(self):
+        return self.process.returncode is None
+
+    async def send(self, request):
+        """
+        Send an audit request and wait for the header of its response.
+
+        Return:
+            <tuple>(<str>, <int>) Status of the response and length of its body
+        """
+        self._next_id += 1
+        self.audits += 1
+        request_id = str(self._next_id)
+
+        self.process.stdin.write(json.dumps({"id": request_id, **request}).encode())
+        self.process.stdin.write(b"\n")
+        await self.process.stdin.drain()
+
+        header = (await self.process.stdout.readline()).decode().split()
+        if len(header) != 3 or header[0] != request_id:
+            raise WorkerError(f"Lighthouse worker answered {header!r}")
+        return header[1], int(header[2])
+
+    async def close(self, stop=False):
+        """
+        Stop the worker, letting it finish what it is doing unless stopped right away.
+        It is only killed if it doesn't exit in time, as a killed worker leaves its
+        Chrome running.
+
+        Parameters:
+            stop <bool> Stop the worker without waiting for its audit, for workers
+                        that failed
+        """
+        if not self.alive:
+            return
+
+        if stop:
+            # worker.js closes its Chrome on SIGTERM
+            self.process.terminate()
+        else:
+            self.process.stdin.close()
+        try:
+            await asyncio.wait_for(self.process.wait(), EXIT_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.process.kill()
+            await self.process.wait()
+
+
+class _BodyReader:
+    """Reads the body of a response from the worker's stdout, up to its length."""
+
+    def __init__(self, stream, length):
+        self._stream = stream
+        self._remaining = length
+
+    async def read(self, size=-1):
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        if not size:
+            return b""
+
+        chunk = await self._stream.read(size)
+        if not chunk:
+            raise WorkerError("Lighthouse worker exited in the middle of a report")
+        self._remaining -= len(chunk)
+        return chunk
+
+    async def skip(self):
+        while await self.read(64 * 1024):
+            pass
+
+
+class LighthouseWorkerPool:
+    """
+    Runs up to `size` Lighthouse workers, audits wait for a free worker.
+
+    Parameters:
+        size <int> Maximum number of workers running at once
+        max_audits <int> Number of audits a worker runs before being recycled
+        timeout <int> Seconds an audit can take before its worker is recycled
+        admission <AdmissionController> Controller admitting the audits, defaults to
+                                        the shared one
+
+    Properties:
+        workers <int> Number of workers currently running
+    """
+
+    def __init__(
+        self, *, size=2, max_audits=100, timeout=AUDIT_TIMEOUT, admission=None
+    ):
+        self._size = size
+        self._admission = admission or get_admission_controller()
+        self._max_audits = max_audits
+        self._timeout = timeout
+        self._idle = []
+        self._busy = set()
+        self._semaphore = None
+        self._released = None
+        self._closed = False
+
+    @property
+    def workers(self):
+        return len(self._idle) + len(self._busy)
+
+    async def audit(self, request, read_report):
+        """
+        Audit a site on the next free worker.
+
+        Parameters:
+            request <dict> Audit request, with keys:
+                "url"       <str> URL of the site
+                "output"    <str> Format of the report
+                "port"      <int> Remote debugging port of a Chrome to audit in
+                "config"    <str> Path to the Lighthouse configuration file
+                "gather"    <str> Folder to save the gathered artifacts in
+                "audit"     <str> Folder of saved artifacts to audit instead of
+                            loading the site
+            read_report <function> Coroutine function reading the report from the
+                                   stream it is given, as long as it has bytes
+
+        Return:
+            Value returned by read_report
+
+        Raise:
+            <SystemError> If Lighthouse couldn't audit the site
+            <WorkerError> If the worker stopped answering
+            <AdmissionRejected> If the audit couldn't be admitted
+        """
+        async with self._admission.slot(LIGHTHOUSE), self._worker() as worker:
+            with timer("lighthouse"):
+                status, length = await asyncio.wait_for(
+                    worker.send(request), self._timeout
+                )
+            body = _BodyReader(worker.process.stdout, length)
+            if status == "ok":
+                report = await asyncio.wait_for(read_report(body), self._timeout)
+            else:
+                message = (await body.read()).decode()
+            # Whatever the reader left would be taken for the next response
+            await body.skip()
+
+        # Raised once the worker is back in the pool, it is still fit for other audits
+        if status != "ok":
+            raise SystemError(f"Lighthouse failed to audit the site\n{message}")
+        return report
+
+    async def close(self):
+        """
+        Stop every worker, busy ones are waited for until their audit is done or
+        times out.
+        """
+        self._closed = True
+        workers, self._idle = self._idle, []
+        for worker in workers:
+            await worker.close()
+
+        released = self._get_released()
+        async with released:
+            try:
+                await asyncio.wait_for(
+                    released.wait_for(lambda: not self._busy), self._timeout
+                )
+            except asyncio.TimeoutError:
+                pass
+        for worker in list(self._busy):
+            await self._recycle(worker, True)
+
+    @asynccontextmanager
+    async def _worker(self):
+        """Borrow a running worker, it is recycled if anything goes wrong."""
+        async with self._get_semaphore():
+            worker = None
+            while self._idle and worker is None:
+                worker = self._idle.pop()
+                if not worker.alive:
+                    worker = None
+            if worker is None:
+                worker = await self._start_worker()
+
+            self._busy.add(worker)
+            failed = False
+            try:
+                yield worker
+            except BaseException:
+                failed = True
+                raise
+            finally:
+                if (
+                    failed
+                    or self._closed
+                    or not worker.alive
+                    or worker.audits >= self._max_audits
+                ):
+                    await self._recycle(worker, failed)
+                else:
+                    self._idle.append(worker)
+
+                self._busy.discard(worker)
+                released = self._get_released()
+                async with released:
+                    released.notify_all()
+
+    def _get_semaphore(self):
+        # Created lazily so that it is bound to the loop the pool is used in
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._size)
+        return self._semaphore
+
+    def _get_released(self):
+        if self._released is None:
+            self._released = asyncio.Condition()
+        return self._released
+
+    async def _start_worker(self):
+        process = await asyncio.create_subprocess_exec(
+            "node",
+            str(WORKER_SCRIPT),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+        )
+        return _Worker(process)
+
+    async def _recycle(self, worker, failed):
+        # Failed workers may be stuck in the middle of an audit
+        try:
+            await worker.close(stop=failed)
+        except Exception:
+            # Crashed workers have nothing left to close
+            if worker.alive:
+                worker.process.kill()
+
+
+_worker_pool = None
+
+
+def get_worker_pool():
+    """
+    Get the Lighthouse worker pool shared by the whole process, its size and the number
+    of audits per worker can be set with the AWE_LIGHTHOUSE_WORKERS and
+    AWE_LIGHTHOUSE_MAX_AUDITS environment variables.
+
+    Return:
+        <LighthouseWorkerPool> The shared worker pool
+    """
+    global _worker_pool
+    if _worker_pool is None:
+        _worker_pool = LighthouseWorkerPool(
+            size=int(os.environ.get("AWE_LIGHTHOUSE_WORKERS") or 2),
+            max_audits=int(os.environ.get("AWE_LIGHTHOUSE_MAX_AUDITS") or 100),
+        )
+    return _worker_pool
+
+
+async def close_worker_pool():
+    """Stop the workers of the shared pool, meant to be called on shutdown."""
+    global _worker_pool
+    if _worker_pool is not None:
+        await _worker_pool.close()
+        _worker_pool = None
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+
+"""
+Timings of the stages of the Engine runs.
+
+Each stage of a run, from launching the browser to serializing the accessible site,
+and each accessibility function is timed into histograms kept for the whole process
+and rendered in the Prometheus text format. The timings of a single request can also
+be collected, for its Server-Timing header.
+
+Stages timed:
+    browser_launch  Launching a browser for the browser pool
+    navigation      Loading the site in a page and getting its HTML
+    lighthouse      Lighthouse auditing the site, until its report starts coming in
+    report_parse    Reading and parsing the JSON report of Lighthouse
+    response_parser ResponseParser turning the report into failing tags
+    reassembly      Putting the fixed tags back in the page
+    serialization   Turning the accessible page into bytes
+"""
+
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+import threading
+import time
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds, the Prometheus defaults with room for the slower audits
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+class Histogram:
+    """
+    Prometheus histogram with a single label, safe to observe from any thread.
+
+    Parameters:
+        name <str> Name of the metric
+        description <str> Help text of the metric
+        label_name <str> Name of the label telling the series apart
+        buckets <tuple> Upper bounds of the buckets in increasing order
+    """
+
+    def __init__(self, name, description, label_name, buckets=BUCKETS):
+        self.name = name
+        self.description = description
+        self.label_name = label_name
+        self._buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label, seconds):
+        """
+        Count a duration in the series of the label.
+
+        Parameters:
+            label <str> Value of the label
+            seconds <float> Duration observed
+        """
+        with self._lock:
+            series = self._series.get(label)
+            if series is None:
+                series = self._series[label] = _Series(len(self._buckets))
+            series.observe(self._bucket_index(seconds), seconds)
+
+    def render(self):
+        """
+        Get the histogram in the Prometheus text format.
+
+        Return:
+            <str> Lines of the histogram, ending with a new line
+        """
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            for label, series in sorted(self._series.items()):
+                label = f'{self.label_name}="{_escape(label)}"'
+                cumulative = 0
+                for bound, count in zip(self._buckets, series.counts):
+                    cumulative += count
+                    lines.append(
+                        f'{self.name}_bucket{{{label},le="{bound:g}"}} {cumulative}'
+                    )
+                lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {series.count}')
+                lines.append(f"{self.name}_sum{{{label}}} {series.sum!r}")
+                lines.append(f"{self.name}_count{{{label}}} {series.count}")
+        return "\n".join(lines) + "\n"
+
+    def _bucket_index(self, seconds):
+        for index, bound in enumerate(self._buckets):
+            if seconds <= bound:
+                return index
+        return None
+
+
+class _Series:
+    """Bucket counts, sum and count of one label of a histogram."""
+
+    def __init__(self, buckets):
+        self.counts = [0] * buckets
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, index, seconds):
+        if index is not None:
+            self.counts[index] += 1
+        self.sum += seconds
+        self.count += 1
+
+
+STAGE_DURATION = Histogram(
+    "awe_stage_duration_seconds", "Seconds spent in each stage of the runs", "stage"
+)
+FUNCTION_DURATION = Histogram(
+    "awe_function_duration_seconds",
+    "Seconds spent in each accessibility function",
+    "function",
+)
+
+# Timings of the current request, tasks started from it share the same list
+_timings = ContextVar("awe_timings", default=None)
+
+
+@contextmanager
+def timer(stage, histogram=STAGE_DURATION):
+    """
+    Time the code run within.
+
+    Parameters:
+        stage <str> Name of the stage, the label of its series
+        histogram <Histogram> Histogram to count the duration in
+    """
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started_at
+        histogram.observe(stage, seconds)
+        timings = _timings.get()
+        if timings is not None:
+            timings.append((f"{histogram.label_name}.{stage}", seconds))
+
+
+def function_timer(function_name):
+    """Time an accessibility function, see timer."""
+    return timer(function_name, FUNCTION_DURATION)
+
+
+def collect_timings():
+    """
+    Start collecting the timings of the current context, such as a request. Timings
+    of other threads and of the functions run in other processes aren't collected.
+
+    Return:
+        <list> Names and seconds of the timings, filled as they are made
+    """
+    timings = []
+    _timings.set(timings)
+    return timings
+
+
+def collected_timings():
+    """
+    Get the timings collected in the current context.
+
+    Return:
+        <list> Timings given by collect_timings, None if they aren't collected
+    """
+    return _timings.get()
+
+
+def server_timing(timings):
+    """
+    Get the Server-Timing header of collected timings, the timings with the same name
+    are added up.
+
+    Parameters:
+        timings <list> Timings given by collect_timings
+
+    Return:
+        <str> Value of the header, empty if nothing was timed
+    """
+    totals = {}
+    for name, seconds in timings:
+        totals[name] = totals.get(name, 0) + seconds
+    return ", ".join(
+        f"{name};dur={seconds * 1000:.1f}" for name, seconds in totals.items()
+    )
+
+
+def render_metrics():
+    """
+    Get every histogram in the Prometheus text format.
+
+    Return:
+        <str> Content of the metrics endpoint, of type CONTENT_TYPE
+    """
+    return "".join(
+        histogram.render() for histogram in (STAGE_DURATION, FUNCTION_DURATION)
+    )
+
+
+def _escape(value):
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
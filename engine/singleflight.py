@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+
+"""
+Coalesces concurrent calls doing the same work.
+
+When a dashboard refreshes, many clients ask for the same site at once. The first call
+for a key does the work, the calls for the same key made while it is in flight wait
+for it and get the same result instead of starting their own browser and Lighthouse.
+"""
+
+
+import asyncio
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time on every event loop, calls are only
+    shared while in flight, nothing is kept once done.
+
+    Properties:
+        in_flight <int> Number of calls currently running
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    @property
+    def in_flight(self):
+        return len(self._calls)
+
+    async def do(self, key, function):
+        """
+        Run the coroutine function unless a call with the same key is in flight, in
+        which case its result is awaited instead. A caller that is cancelled doesn't
+        cancel the call for the others.
+
+        Parameters:
+            key Hashable key of the work
+            function <function> Coroutine function doing the work
+
+        Return:
+            <tuple>(Result of the call, <bool>) And whether it came from a call made by
+                                                another caller
+        """
+        # Futures belong to the loop they are made on
+        call_key = (asyncio.get_event_loop(), key)
+        call = self._calls.get(call_key)
+        shared = call is not None
+        if not shared:
+            call = asyncio.ensure_future(function())
+            self._calls[call_key] = call
+            call.add_done_callback(lambda _: self._calls.pop(call_key, None))
+
+        return await asyncio.shield(call), shared
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+
+"""
+Site wide version of the Engine.
+
+Pages are discovered from the site's sitemap.xml and from the links of the pages that
+were already processed. Each page goes through the full Engine run, the accessible
+version of every page is written to the output directory along with a report of the
+scores of the whole site.
+"""
+
+
+from .cache import normalize_url
+from .engine import Engine
+from .jobs import stage
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
+from xml.etree import ElementTree
+import asyncio
+import hashlib
+import json
+import requests
+
+SITEMAP_NS = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+
+# Characters of the path kept in the file name of a page, the rest would only risk
+# going over the file system's limit
+MAX_FILE_NAME_PATH = 100
+
+# Links to these are not pages and are not worth a browser and a Lighthouse run
+SKIPPED_EXTENSIONS = (
+    ".css",
+    ".gif",
+    ".ico",
+    ".jpeg",
+    ".jpg",
+    ".js",
+    ".mp3",
+    ".mp4",
+    ".pdf",
+    ".png",
+    ".svg",
+    ".webp",
+    ".xml",
+    ".zip",
+)
+
+
+class SiteCrawler:
+    """
+    Runs the Engine on every page of a site.
+
+    Parameters:
+        root_url <str> URL of the site, its host bounds the pages that are visited
+        output_dir <Path> Directory the accessible pages and the report are written to
+        max_pages <int> Maximum number of pages processed
+        concurrency <int> Number of pages processed at the same time
+        engine_options <dict> Keyword arguments given to every Engine, like the cache
+        on_stage <function> Called with the state of the "site" stage, like the
+                            Engine's on_stage
+
+    Properties:
+        target_url <str> URL of the site
+    """
+
+    def __init__(
+        self,
+        *,
+        root_url,
+        output_dir,
+        max_pages=50,
+        concurrency=4,
+        engine_options=None,
+        on_stage=None,
+    ):
+        self.target_url = root_url
+        self.on_stage = on_stage
+        self._root_url = root_url
+        self._host = urlsplit(root_url).netloc.lower()
+        self._output_dir = Path(output_dir)
+        self._max_pages = max_pages
+        self._concurrency = concurrency
+        self._engine_options = engine_options or {}
+
+        self._queue = None
+        self._seen = set()
+        self._canonicals = set()
+        self._pages = []
+
+    async def run(self):
+        """
+        Discover and process the pages of the site.
+
+        Return:
+            <dict> Report of the site, also written to report.json:
+                "root"      <str> URL of the site
+                "pages"     <list> Result of every page, see _process_page
+                "score"     <float> Average accessibility score of the pages
+        """
+        with stage(self.on_stage, "site"):
+            self._output_dir.mkdir(parents=True, exist_ok=True)
+            self._queue = asyncio.Queue()
+
+            self._enqueue(self._root_url)
+            for url in await self._sitemap_urls():
+                self._enqueue(url)
+
+            workers = [
+                asyncio.ensure_future(self._worker()) for _ in range(self._concurrency)
+            ]
+            try:
+                await self._queue.join()
+            finally:
+                for worker in workers:
+                    worker.cancel()
+
+        scores = [page["score"] for page in self._pages if page["score"] is not None]
+        report = {
+            "root": self._root_url,
+            "pages": self._pages,
+            "score": sum(scores) / len(scores) if scores else None,
+        }
+        Path(self._output_dir, "report.json").write_text(json.dumps(report, indent=2))
+        return report
+
+    def _enqueue(self, url):
+        """Queue the page if it belongs to the site and hasn't been seen yet."""
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or parts.netloc.lower() != self._host:
+            return
+        if parts.path.lower().endswith(SKIPPED_EXTENSIONS):
+            return
+
+        url = normalize_url(url)
+        if url in self._seen or len(self._seen) >= self._max_pages:
+            return
+
+        self._seen.add(url)
+        self._queue.put_nowait(url)
+
+    async def _worker(self):
+        while True:
+            url = await self._queue.get()
+            page = {
+                "url": url,
+                "canonical": url,
+                "score": None,
+                "file": None,
+                "error": None,
+            }
+            try:
+                await self._process_page(page)
+            except Exception as e:
+                # Whatever went wrong, the other pages go on
+                page["error"] = f"{type(e).__name__}: {e}"
+                self._pages.append(page)
+            finally:
+                self._queue.task_done()
+
+    async def _process_page(self, page):
+        """
+        Run the Engine on the page, write its accessible version and queue its links.
+        The page is added to the report unless another URL of it already was.
+
+        Parameters:
+            page <dict> Result of the page, filled as it is processed:
+                "url"       <str> URL of the page
+                "canonical" <str> Canonical URL declared by the page
+                "score"     <float> Lighthouse accessibility score
+                "file"      <str> Name of the accessible page in the output directory
+                "error"     <str> Reason the page failed, None if it did not
+        """
+        url = page["url"]
+        engine = Engine(target_url=url, **self._engine_options)
+        await engine.run_engine()
+
+        soup = engine.html_soup
+        canonical = soup.find("link", rel="canonical", href=True)
+        if canonical is not None:
+            page["canonical"] = normalize_url(urljoin(url, canonical["href"]))
+
+        # Another URL of the same page was already written
+        if page["canonical"] in self._canonicals:
+            return
+        self._canonicals.add(page["canonical"])
+
+        page["file"] = _page_file_name(page["canonical"])
+        Path(self._output_dir, page["file"]).write_bytes(
+            engine.accessible_site.getvalue()
+        )
+        page["score"] = engine.score
+
+        for link in soup.find_all("a", href=True):
+            self._enqueue(urljoin(url, link["href"]).split("#")[0])
+        self._pages.append(page)
+
+    async def _sitemap_urls(self):
+        """
+        Get the page URLs listed by the site's sitemap, following sitemap indexes.
+
+        Return:
+            <list> URLs of the sitemap, empty if the site has none
+        """
+        loop = asyncio.get_event_loop()
+        sitemaps = [urljoin(self._root_url, "/sitemap.xml")]
+        visited = set()
+        urls = []
+
+        while sitemaps and len(urls) < self._max_pages:
+            sitemap = sitemaps.pop()
+            if sitemap in visited:
+                continue
+            visited.add(sitemap)
+
+            try:
+                response = await loop.run_in_executor(
+                    None, lambda: requests.get(sitemap, timeout=10)
+                )
+                response.raise_for_status()
+                root = ElementTree.fromstring(response.content)
+            except (requests.RequestException, ElementTree.ParseError):
+                continue
+
+            locations = [loc.text.strip() for loc in root.iter(f"{SITEMAP_NS}loc")]
+            if root.tag == f"{SITEMAP_NS}sitemapindex":
+                sitemaps.extend(locations)
+            else:
+                urls.extend(locations)
+
+        return urls
+
+
+def _page_file_name(url):
+    """Name of the file the accessible version of the page is written to."""
+    parts = urlsplit(url)
+    path = parts.path.strip("/")
+    name = path.replace("/", "_")[:MAX_FILE_NAME_PATH] or "index"
+    # Different paths can give the same name, as /a/b and /a_b do
+    if path or parts.query:
+        digest = hashlib.sha1(f"{parts.path}?{parts.query}".encode()).hexdigest()
+        name += "_" + digest[:8]
+    return f"{name}.html"
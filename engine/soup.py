@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+"""
+Single place where HTML gets parsed into BeautifulSoup trees.
+
+The parser backend is shared by the whole engine, the crawler and the accessibility
+functions, so that the page and the fixed snippets are built the same way. It defaults
+to Python's "html.parser" and can be changed with set_parser or with the
+AWE_HTML_PARSER environment variable, for example to the much faster "lxml".
+"""
+
+
+from bs4 import BeautifulSoup, FeatureNotFound
+import os
+import re
+
+PARSERS = ("html.parser", "lxml", "html5lib")
+
+# Tags that lxml and html5lib add around fragments when they are missing
+_DOCUMENT_TAGS = ("html", "head", "body")
+_FIRST_TAG = re.compile(r"\s*<([a-zA-Z][\w-]*)")
+
+_parser = os.environ.get("AWE_HTML_PARSER") or "html.parser"
+
+
+def set_parser(name):
+    """
+    Change the parser backend used by the engine.
+
+    Parameters:
+        name <str> One of PARSERS, its library must be installed
+
+    Raise:
+        <ValueError> If the parser is unknown or its library isn't installed
+    """
+    global _parser
+    if name not in PARSERS:
+        raise ValueError(f"Unknown HTML parser {name}, expected one of {PARSERS}")
+
+    try:
+        BeautifulSoup("", name)
+    except FeatureNotFound:
+        raise ValueError(f"The library for the {name} HTML parser is not installed")
+
+    _parser = name
+
+
+def get_parser():
+    """Get the name of the parser backend used by the engine."""
+    return _parser
+
+
+def make_soup(markup, parser=None):
+    """
+    Parse a full HTML document.
+
+    Parameters:
+        markup <str> HTML to parse
+        parser <str> Parser to use instead of the engine's one
+
+    Return:
+        <BeautifulSoup> Parsed document
+    """
+    return BeautifulSoup(markup, parser or _parser)
+
+
+def tag_name(markup):
+    """
+    Get the name of the first tag of an HTML snippet without parsing it.
+
+    Parameters:
+        markup <str> HTML snippet
+
+    Return:
+        <str> Lower case name of the tag or None if the snippet doesn't start with one
+    """
+    match = _FIRST_TAG.match(markup)
+    return match.group(1).lower() if match else None
+
+
+def make_tag(markup, parser=None):
+    """
+    Parse an HTML fragment and get its first tag, ignoring the document tags some
+    parsers wrap fragments in.
+
+    Parameters:
+        markup <str> HTML snippet to parse
+        parser <str> Parser to use instead of the engine's one
+
+    Return:
+        <bs4.element.Tag> First tag of the snippet or None if it has none
+    """
+    parser = parser or _parser
+    soup = make_soup(markup, parser)
+    if parser == "html.parser":
+        return soup.find()
+
+    first_tag = None
+    for tag in soup.find_all(True):
+        if tag.name in _DOCUMENT_TAGS and not re.search(
+            rf"<{tag.name}[\s>/]", markup, re.IGNORECASE
+        ):
+            continue
+        first_tag = tag
+        break
+
+    # Document parsers drop fragments that are only valid in context, like a lone
+    # <td>, html.parser keeps them as they are
+    expected = tag_name(markup)
+    if expected and (first_tag is None or first_tag.name != expected):
+        return make_soup(markup, "html.parser").find()
+    return first_tag
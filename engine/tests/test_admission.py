@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+
+from engine import admission
+from engine.admission import BROWSER, AdmissionController, AdmissionRejected
+import asyncio
+import pytest
+
+
+async def hold(controller, kind, events, name, release):
+    async with controller.slot(kind):
+        events.append(name)
+        await release.wait()
+
+
+def test_queue_full_rejected():
+    async def main():
+        controller = AdmissionController(max_browsers=1, max_queue=1, timeout=5)
+        release = asyncio.Event()
+        events = []
+        tasks = [
+            asyncio.ensure_future(hold(controller, BROWSER, events, name, release))
+            for name in ("held", "queued")
+        ]
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejected) as rejection:
+            async with controller.slot(BROWSER):
+                pass
+
+        release.set()
+        await asyncio.gather(*tasks)
+        return events, rejection.value, controller.stats[BROWSER]
+
+    events, rejection, stats = asyncio.run(main())
+
+    assert events == ["held", "queued"]
+    assert rejection.retry_after == 5
+    assert stats["rejected"] == 1
+    assert stats["admitted"] == 2
+    assert stats["queued"] == 0
+    assert stats["active"] == 0
+
+
+def test_deadline_while_queued():
+    async def main():
+        controller = AdmissionController(max_browsers=1, timeout=0.05)
+        release = asyncio.Event()
+        task = asyncio.ensure_future(hold(controller, BROWSER, [], "held", release))
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejected) as rejection:
+            async with controller.slot(BROWSER):
+                pass
+        stats = controller.stats[BROWSER]
+
+        release.set()
+        await task
+        return rejection.value, stats
+
+    rejection, stats = asyncio.run(main())
+
+    assert "Waited more than" in str(rejection)
+    assert rejection.retry_after == 1
+    assert stats["queued"] == 0
+    assert stats["active"] == 1
+    assert stats["rejected"] == 1
+
+
+def test_wake_up_order():
+    async def main():
+        controller = AdmissionController(max_browsers=2, timeout=5)
+        releases = {name: asyncio.Event() for name in "abcdef"}
+        events = []
+        tasks = []
+        for name, release in releases.items():
+            tasks.append(
+                asyncio.ensure_future(hold(controller, BROWSER, events, name, release))
+            )
+            await asyncio.sleep(0)
+
+        for name in "abcdef":
+            releases[name].set()
+            await asyncio.sleep(0.01)
+        await asyncio.gather(*tasks)
+        return events
+
+    # Queued work starts in the order it came in
+    assert asyncio.run(main()) == list("abcdef")
+
+
+def test_cancelled_while_queued():
+    async def main():
+        controller = AdmissionController(max_browsers=1, timeout=5)
+        release = asyncio.Event()
+        events = []
+        held = asyncio.ensure_future(hold(controller, BROWSER, events, "held", release))
+        await asyncio.sleep(0)
+        cancelled = asyncio.ensure_future(
+            hold(controller, BROWSER, events, "cancelled", release)
+        )
+        queued = asyncio.ensure_future(
+            hold(controller, BROWSER, events, "queued", release)
+        )
+        await asyncio.sleep(0)
+
+        cancelled.cancel()
+        release.set()
+        await asyncio.gather(held, queued)
+        return events, controller.stats[BROWSER]
+
+    events, stats = asyncio.run(main())
+
+    assert events == ["held", "queued"]
+    assert stats["active"] == 0
+    assert stats["queued"] == 0
+
+
+def test_waits_for_memory(monkeypatch):
+    memory = [0]
+    monkeypatch.setattr(admission, "MEMORY_POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(admission, "available_memory", lambda: memory[0])
+
+    async def main():
+        controller = AdmissionController(min_memory=100, timeout=5)
+        events = []
+        task = asyncio.ensure_future(
+            hold(controller, BROWSER, events, "started", asyncio.Event())
+        )
+        await asyncio.sleep(0.05)
+        waiting = list(events)
+
+        memory[0] = 100
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return waiting, events
+
+    assert asyncio.run(main()) == ([], ["started"])
+
+
+def test_memory_not_reported(monkeypatch):
+    monkeypatch.setattr(admission, "available_memory", lambda: None)
+
+    async def main():
+        controller = AdmissionController(min_memory=100, timeout=0.05)
+        async with controller.slot(BROWSER):
+            return True
+
+    assert asyncio.run(main())
+
+
+def test_retry_after_from_held_time():
+    async def main():
+        controller = AdmissionController(max_browsers=1, max_queue=0, timeout=60)
+        gate = controller._gates[BROWSER]
+        gate.total_held = 30.0
+        gate.released = 2
+        gate.queued = 1
+
+        with pytest.raises(AdmissionRejected) as rejection:
+            async with controller.slot(BROWSER):
+                pass
+        return rejection.value
+
+    # 15s held on average, for the one queued run and this one
+    assert asyncio.run(main()).retry_after == 30
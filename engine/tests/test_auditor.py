@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+from engine import auditor
+from engine.soup import make_soup
+import pytest
+
+
+def run_audit(body, function_name, head=""):
+    html = (
+        f'<!DOCTYPE html><html lang="en"><head><title>Page</title>{head}</head>'
+        f"<body>{body}</body></html>"
+    )
+    return auditor.audit(make_soup(html), [function_name])["audits"][function_name]
+
+
+def snippets(result):
+    return [item["node"]["snippet"] for item in result["details"]["items"]]
+
+
+@pytest.mark.parametrize(
+    "content,score",
+    [
+        ("width=device-width", 1),
+        ("width=device-width, maximum-scale=5", 1),
+        ("width=device-width, maximum-scale=3", 0),
+        ("width=device-width, maximum-scale=1.5", 0),
+        ("width=device-width, user-scalable=no", 0),
+        ("width=device-width, maximum-scale=yes", 1),
+    ],
+)
+def test_meta_viewport(content, score):
+    meta = f'<meta name="viewport" content="{content}">'
+    assert run_audit("", "meta-viewport", head=meta)["score"] == score
+
+
+@pytest.mark.parametrize(
+    "content,score",
+    [("0; url=/next", 1), ("30", 0), ("30; url=/next", 0), ("80000", 1)],
+)
+def test_meta_refresh(content, score):
+    meta = f'<meta http-equiv="refresh" content="{content}">'
+    assert run_audit("", "meta-refresh", head=meta)["score"] == score
+
+
+def test_rules_without_elements_not_applicable():
+    assert run_audit("<p>Text</p>", "image-alt")["score"] is None
+    assert run_audit("<p>Text</p>", "meta-viewport")["score"] is None
+    assert run_audit("<p>Text</p>", "definition-list")["score"] is None
+
+
+def test_image_alt():
+    result = run_audit(
+        '<img src="a.png" alt=""><img src="b.png" role="presentation">'
+        '<img src="c.png" title="Chart"><img src="d.png">',
+        "image-alt",
+    )
+
+    assert result["score"] == 0
+    assert snippets(result) == ['<img src="d.png">']
+
+
+def test_duplicate_id_and_accesskeys():
+    body = '<a id="a" accesskey="S">1</a><a id="a" accesskey="s">2</a><a id="b">3</a>'
+
+    assert len(snippets(run_audit(body, "duplicate-id"))) == 2
+    assert len(snippets(run_audit(body, "accesskeys"))) == 2
+
+
+def test_definition_list():
+    good = "<dl><dt>Term</dt><dd>Definition</dd><div><dt>A</dt><dd>B</dd></div></dl>"
+    bad = "<dl><dt>Term</dt><p>Definition</p></dl>"
+
+    assert run_audit(good, "definition-list")["score"] == 1
+    assert run_audit(bad, "definition-list")["score"] == 0
+
+
+def test_html_lang_and_document_title():
+    html = "<html><head><title> </title></head><body></body></html>"
+    audits = auditor.audit(make_soup(html), ["html-lang", "document-title"])["audits"]
+
+    assert audits["html-lang"]["score"] == 0
+    assert audits["document-title"]["score"] == 0
+
+
+def test_node_details():
+    result = run_audit(
+        '<div><p>Text</p><img src="a.png"><img src="b.png"></div>', "image-alt"
+    )
+
+    nodes = [item["node"] for item in result["details"]["items"]]
+    assert [node["selector"] for node in nodes] == [
+        "html > body > div > img:nth-of-type(1)",
+        "html > body > div > img:nth-of-type(2)",
+    ]
+    assert nodes[0]["path"] == "1,HTML,1,BODY,0,DIV,1,IMG"
+
+
+def test_snippet_attribute_with_angle_brackets():
+    result = run_audit(
+        '<img src="a.png" data-note="a > b" title="" class="x y" data-q=\'say "hi" & go\'>',
+        "image-alt",
+    )
+
+    assert snippets(result) == [
+        '<img src="a.png" data-note="a > b" title="" class="x y"'
+        ' data-q="say &quot;hi&quot; &amp; go">'
+    ]
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+from engine.cache import Cache, make_key, normalize_url
+import os
+import time
+
+
+def test_disk_tier_bounded(tmp_path):
+    cache = Cache(directory=tmp_path, max_disk_size=2500)
+
+    for index in range(5):
+        cache.set(make_key(index), b"x" * 1000)
+
+    assert len(list(tmp_path.glob("*.pickle"))) == 2
+    assert cache.disk_size <= 2500
+    assert make_key(4) in cache
+
+
+def test_disk_tier_drops_expired(tmp_path):
+    old = Cache(directory=tmp_path, ttl=60)
+    old.set(make_key("old"), "value")
+    stale = time.time() - 120
+    for path in tmp_path.glob("*.pickle"):
+        os.utime(path, (stale, stale))
+
+    cache = Cache(directory=tmp_path, ttl=60)
+    cache.set(make_key("new"), "value")
+
+    assert [path.stem for path in tmp_path.glob("*.pickle")] == [make_key("new")]
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    Cache(directory=tmp_path).set(make_key("site"), {"score": 1})
+
+    cache = Cache(directory=tmp_path)
+
+    assert cache.get(make_key("site")) == {"score": 1}
+    assert (
+        cache.disk_size
+        == tmp_path.joinpath(f"{make_key('site')}.pickle").stat().st_size
+    )
+
+
+def test_normalize_url():
+    assert normalize_url("HTTP://Example.com:80/a#top") == "http://example.com/a"
+    assert normalize_url("https://example.com:8443") == "https://example.com:8443/"
+
+
+def test_normalize_url_bad_port():
+    assert normalize_url("http://host:99999/") == "http://host:99999/"
+    assert normalize_url("http://host:port/") == "http://host:port/"
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+from engine.engine import Engine
+from engine.soup import make_soup
+
+PAGE = (
+    "<!DOCTYPE html>\r\n<html><head><title>Page&nbsp;one</title>\r\n"
+    "<script>var s = '<img src=x>';</script></head>\r\n"
+    "<BODY class=main >  <!-- <img src=c.png> -->\r\n"
+    "<p>a<img src=a.png>\r\n  <img   src='b.png' ></p>\r\n"
+    "<ul><li>one<li>two <b>&amp;</b></ul>\r\n"
+    "<div id=box><img src=d.png><br><span>&copy;</span></div>\r\n"
+    "</BODY></html>\r\n"
+)
+
+
+def patch(changes):
+    engine = Engine(target_url="https://example.com")
+    engine._crawler.load(PAGE)
+    soup = engine._crawler.html_soup
+    for change in changes:
+        engine._changed_elements.append(change(soup))
+    return engine._patch_source_html()
+
+
+def set_alt(index):
+    def change(soup):
+        image = soup.find_all("img")[index]
+        image["alt"] = ""
+        return image, image
+
+    return change
+
+
+def test_patch_keeps_untouched_bytes():
+    patched = patch([set_alt(1)])
+
+    assert (
+        patched
+        == PAGE.replace("<img   src='b.png' >", '<img alt="" src="b.png"/>').encode()
+    )
+
+
+def test_patch_several_elements():
+    def replace_list(soup):
+        original = soup.ul
+        fixed = make_soup('<ul role="list"><li>one</li></ul>', "html.parser").ul
+        original.replace_with(fixed)
+        return original, fixed
+
+    patched = patch([set_alt(2), replace_list, set_alt(0)])
+
+    expected = (
+        PAGE.replace("<img src=a.png>", '<img alt="" src="a.png"/>')
+        .replace(
+            "<ul><li>one<li>two <b>&amp;</b></ul>", '<ul role="list"><li>one</li></ul>'
+        )
+        .replace("<img src=d.png>", '<img alt="" src="d.png"/>')
+    )
+    assert patched == expected.encode()
+
+
+def test_patch_nested_changes_serialized_once():
+    def change_box(soup):
+        box = soup.find(id="box")
+        box["role"] = "group"
+        return box, box
+
+    patched = patch([set_alt(2), change_box])
+
+    assert (
+        patched
+        == PAGE.replace(
+            "<div id=box><img src=d.png><br><span>&copy;</span></div>",
+            '<div id="box" role="group"><img alt="" src="d.png"/><br/><span>©</span></div>',
+        ).encode()
+    )
+
+
+def test_patch_nothing_changed():
+    assert patch([]) == PAGE.encode()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+
+"""
+Setup shared by the Flask server, app.py, and the ASGI server, asgi.py.
+
+Both servers take the same parameters and share the same cache, artifact store and
+limits, what they have in common lives here so that they can't drift apart.
+"""
+
+
+from engine import Engine, SiteCrawler
+from engine.admission import AdmissionRejected, get_admission_controller
+from engine.cache import Cache
+from engine.lighthouse import AUDIT_CONFIGS, ArtifactStore
+from engine.metrics import (
+    CONTENT_TYPE,
+    collect_timings,
+    collected_timings,
+    render_metrics,
+    server_timing,
+)
+from functools import wraps
+from pathlib import Path
+from urllib.parse import urlsplit
+import inspect
+import os
+import re
+
+
+ROOT_DIR = Path(os.environ.get("ROOT_DIR") or Path.cwd())
+OUTPUT_DIR = Path(ROOT_DIR, "results/")
+
+# Audits and accessible sites are reused for AWE_CACHE_TTL seconds, setting
+# AWE_CACHE_DISK also keeps up to AWE_CACHE_DISK_SIZE bytes of them in the results
+# folder across restarts
+cache = Cache(
+    ttl=int(os.environ.get("AWE_CACHE_TTL") or 3600),
+    max_size=int(os.environ.get("AWE_CACHE_SIZE") or 64 * 2 ** 20),
+    directory=Path(OUTPUT_DIR, "cache") if os.environ.get("AWE_CACHE_DISK") else None,
+    max_disk_size=int(os.environ.get("AWE_CACHE_DISK_SIZE") or 512 * 2 ** 20),
+)
+
+# Setting AWE_ARTIFACTS keeps what Lighthouse gathers from the sites in the results
+# folder, the sites are audited again from it for AWE_ARTIFACTS_TTL seconds
+artifacts = (
+    ArtifactStore(
+        Path(OUTPUT_DIR, "artifacts"),
+        ttl=int(os.environ.get("AWE_ARTIFACTS_TTL") or 86400),
+    )
+    if os.environ.get("AWE_ARTIFACTS")
+    else None
+)
+
+# Setting AWE_SERVER_TIMING sends the time spent in each stage of a request back in its
+# Server-Timing header
+SERVER_TIMING = bool(os.environ.get("AWE_SERVER_TIMING"))
+
+
+def register(app):
+    """
+    Add the endpoints, error handlers and hooks both servers have.
+
+    Parameters:
+        app <Flask|Quart> Application of the server
+    """
+    app.add_url_rule("/api/admission", "admission_stats", _native(app, admission_stats))
+    app.add_url_rule("/api/metrics", "metrics", _native(app, metrics))
+    app.register_error_handler(AdmissionRejected, _native(app, admission_rejected))
+    if SERVER_TIMING:
+        app.before_request(_native(app, start_timings))
+        app.after_request(_native(app, add_server_timing))
+
+
+def admission_stats():
+    """Limits, queue depth and wait times of the crawls and audits."""
+    return get_admission_controller().stats, 200
+
+
+def metrics():
+    """Time spent in each stage of the runs, in the Prometheus text format."""
+    return render_metrics(), 200, {"Content-Type": CONTENT_TYPE}
+
+
+def admission_rejected(error):
+    return {"error": str(error)}, 503, {"Retry-After": str(error.retry_after)}
+
+
+def start_timings():
+    collect_timings()
+
+
+def add_server_timing(response):
+    timings = collected_timings()
+    if timings:
+        response.headers["Server-Timing"] = server_timing(timings)
+    return response
+
+
+def engine_from_values(values):
+    """
+    Build the Engine described by the parameters of a request.
+
+    Parameters:
+        values <MultiDict> Parameters of the request
+
+    Return:
+        <Engine> Engine of the request, using the shared cache and artifact store
+    """
+    return Engine(
+        target_url=values.get("url", default="", type=str),
+        audit_config=audit_config(values),
+        shared_session=values.get("shared_session", default=False, type=flag),
+        in_place=values.get("in_place", default=False, type=flag),
+        parallel=values.get("parallel", default=False, type=flag),
+        contrast_stylesheet=values.get("stylesheet", default=False, type=flag),
+        patch_source=values.get("patch_source", default=True, type=flag),
+        fast=values.get("fast", default=False, type=flag),
+        cache=cache,
+        artifacts=artifacts,
+    )
+
+
+def site_crawler_from_values(values):
+    """
+    Build the SiteCrawler described by the parameters of a request, its number of
+    pages is capped by AWE_SITE_MAX_PAGES.
+
+    Parameters:
+        values <MultiDict> Parameters of the request
+
+    Return:
+        <SiteCrawler> SiteCrawler of the request writing to the results folder
+    """
+    target_url = values.get("url", default="", type=str)
+    max_pages = values.get("max_pages", default=50, type=int)
+    max_site_pages = int(os.environ.get("AWE_SITE_MAX_PAGES") or 200)
+
+    return SiteCrawler(
+        root_url=target_url,
+        output_dir=site_output_dir(target_url),
+        max_pages=max(1, min(max_pages, max_site_pages)),
+        concurrency=batch_limits({})["concurrency"],
+        engine_options={"cache": cache, "artifacts": artifacts},
+    )
+
+
+def audit_config(values, default=None):
+    """Get the Lighthouse configuration asked for by the request."""
+    config = values.get("config", default=default, type=str)
+
+    # Ensure a valid configuration is given if not, use the engine's default
+    if config not in AUDIT_CONFIGS:
+        config = AUDIT_CONFIGS[0]
+    return config
+
+
+def flag(value):
+    """Query string to bool converter, "1", "true" and "yes" are truthy."""
+    return value.lower() in ("1", "true", "yes")
+
+
+def batch_limits(body):
+    """Concurrency limits asked for by the batch request, capped by the server's."""
+    max_concurrency = int(os.environ.get("AWE_BATCH_CONCURRENCY") or 8)
+    concurrency = int(body.get("concurrency") or max_concurrency)
+    per_host = int(body.get("per_host") or 2)
+    return {
+        "concurrency": max(1, min(concurrency, max_concurrency)),
+        "per_host": max(1, min(per_host, max_concurrency)),
+    }
+
+
+def site_output_dir(url):
+    """Folder of the results folder the pages of the site are written to."""
+    host = re.sub(r"[^\w.-]", "_", urlsplit(url).netloc) or "site"
+    return Path(OUTPUT_DIR, "sites", host)
+
+
+def _native(app, function):
+    """
+    Quart runs the functions that aren't coroutines in a thread, where the timings of
+    the request aren't collected, they are given to it as coroutines instead.
+    """
+    if not inspect.iscoroutinefunction(app.full_dispatch_request):
+        return function
+
+    @wraps(function)
+    async def coroutine(*args, **kwargs):
+        return function(*args, **kwargs)
+
+    return coroutine